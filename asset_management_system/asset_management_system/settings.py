@@ -84,6 +84,19 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/ref/settings/#caches
+# Local memory is per process. Rate limits, idempotency keys and the
+# scheduler's tick lock only hold across workers with a shared backend,
+# e.g. django.core.cache.backends.redis.RedisCache.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -135,3 +148,48 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # Add these settings
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'asset_list'
+
+# Retention policy for processed asset requests (see assets/retention.py)
+ASSET_RETENTION = {
+    'PROCESSED_REQUEST_DAYS': 90,
+    'CHUNK_SIZE': 500,
+    'ARCHIVE_DIR': BASE_DIR / 'archive',
+}
+
+# PDF report engine (see assets/reporting.py). Sections are rendered in
+# WORKERS processes and streamed into one file. The pool is forked from the
+# web process, which is unsafe under a threaded server: set WORKERS to 1
+# there to render in-process.
+ASSET_REPORTS = {
+    'WORKERS': None,
+    'ROWS_PER_PART': 500,
+}
+
+# Rate limits as (calls allowed, per this many seconds) per endpoint (see
+# assets/throttling.py). Counters, throttle_stats totals and idempotency
+# results live in the default cache, so with several workers CACHES must
+# point at a shared backend (Redis, Memcached or the database cache);
+# the local-memory cache keeps separate limits in every worker.
+ASSET_RATE_LIMITS = {
+    'request_asset': (5, 60),
+}
+
+# Maintenance scheduler (see assets/scheduler.py). Run it with
+# `manage.py run_scheduler`, or set IN_PROCESS to tick on a thread in the
+# web process. With IN_PROCESS and several workers, configure a shared cache
+# backend so the tick lock keeps them from ticking at the same time.
+ASSET_SCHEDULER = {
+    'IN_PROCESS': False,
+    'INTERVAL': 60,
+    'BATCH_SIZE': 500,
+    'LOCK_TIMEOUT': 300,
+}
+
+# Uploads larger than this are streamed to a temporary file instead of
+# being held in memory; ContentAddressedStorage then hashes them in chunks
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+
+# Media transfer offloading for views.serve_media: None (FileResponse),
+# 'X-Accel-Redirect' (nginx, internal location below) or 'X-Sendfile'
+MEDIA_SENDFILE_HEADER = None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
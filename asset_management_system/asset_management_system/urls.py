@@ -15,7 +15,6 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from django.contrib.auth import views as auth_views
@@ -26,11 +25,14 @@ urlpatterns = [
     path('', views.dashboard, name='dashboard'),
     path('assets/', views.asset_list, name='asset_list'),
     path('assets/<int:pk>/', views.asset_detail, name='asset_detail'),
+    path('assets/bulk/', views.asset_bulk_action, name='asset_bulk_action'),
     path('assets/create/', views.asset_create, name='asset_create'),
     path('assets/<int:pk>/edit/', views.asset_update, name='asset_update'),
     path('assets/<int:pk>/delete/', views.asset_delete, name='asset_delete'),
     path('assets/<int:pk>/request/', views.request_asset, name='request_asset'),
+    path('users/search/', views.user_search, name='user_search'),
     path('requests/', views.manage_requests, name='manage_requests'),
+    path('requests/throttle-stats/', views.throttle_stats, name='throttle_stats'),
     path('requests/<int:request_id>/<str:action>/', views.process_request, name='process_request'),
     path('switch-user/', views.switch_user, name='switch_user'),
     path('login/', auth_views.LoginView.as_view(template_name='registration/login.html'), name='login'),
@@ -40,5 +42,8 @@ urlpatterns = [
     path('requests/clear-history/', views.clear_request_history, name='clear_request_history'),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Media is served by views.serve_media in every environment so uploads get
+# long-lived cache headers and X-Sendfile/X-Accel-Redirect offloading
+urlpatterns += [
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", views.serve_media, name='serve_media'),
+]
@@ -1,7 +1,29 @@
-
 from django.contrib import admin
-from .models import Department, Asset, AssetRequest
+from .models import Department, Asset, AssetRequest, HistoryPurge, MaintenanceSchedule
+
+@admin.register(Department)
+class DepartmentAdmin(admin.ModelAdmin):
+    list_display = ('name', 'parent')
+    list_filter = ('parent',)
 
-admin.site.register(Department)
 admin.site.register(Asset)
-admin.site.register(AssetRequest)
+@admin.register(AssetRequest)
+class AssetRequestAdmin(admin.ModelAdmin):
+    list_display = ('asset', 'user', 'request_date', 'approved')
+    list_filter = ('approved',)
+    raw_id_fields = ('asset', 'user')
+
+    def save_model(self, request, obj, form, change):
+        # Editing approved or asset here bypasses the request views, which
+        # maintain Asset.pending_request_count; recount the assets involved
+        asset_ids = {obj.asset_id}
+        if change:
+            asset_ids.update(AssetRequest.objects.filter(pk=obj.pk).values_list('asset_id', flat=True))
+        super().save_model(request, obj, form, change)
+        Asset.objects.filter(pk__in=asset_ids).recount_pending_requests()
+admin.site.register(HistoryPurge)
+
+@admin.register(MaintenanceSchedule)
+class MaintenanceScheduleAdmin(admin.ModelAdmin):
+    list_display = ('asset', 'interval', 'next_due', 'last_triggered', 'retire_on')
+    raw_id_fields = ('asset',)
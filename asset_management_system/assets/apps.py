@@ -1,6 +1,24 @@
+import os
+import sys
+
 from django.apps import AppConfig
 
 
 class AssetsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'assets'
+
+    def ready(self):
+        from . import signals  # noqa: F401 (connects the receivers)
+        from .scheduler import get_scheduler_settings, start_in_process
+
+        if not get_scheduler_settings()['IN_PROCESS']:
+            return
+        # Only in the serving process: not in management commands, and not
+        # in the autoreloader's parent process
+        if 'runserver' in sys.argv and os.environ.get('RUN_MAIN') != 'true':
+            return
+        command_line = os.path.basename(sys.argv[0]) in ('manage.py', 'django-admin')
+        if command_line and sys.argv[1:2] != ['runserver']:
+            return
+        start_in_process()
@@ -1,7 +1,15 @@
+import math
+
 from django.shortcuts import redirect
 from django.contrib import messages
+from django.http import HttpResponse, JsonResponse
 from functools import wraps
 
+from .throttling import (
+    check_rate_limit, claim_idempotency_key, get_idempotent_result,
+    release_idempotency_key, request_fingerprint, store_idempotent_result,
+)
+
 def admin_required(view_func):
     @wraps(view_func)
     def _wrapped_view(request, *args, **kwargs):
@@ -9,4 +17,77 @@ def admin_required(view_func):
             return view_func(request, *args, **kwargs)
         messages.error(request, '🚫 Access Denied: You do not have permission to perform this action.')
         return redirect('asset_list')
-    return _wrapped_view 
\ No newline at end of file
+    return _wrapped_view 
+
+def rate_limit(scope):
+    """Throttle POSTs per user with the token bucket configured for `scope`"""
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if request.method == 'POST':
+                wait = check_rate_limit(scope, request.user)
+                if wait:
+                    error = 'Too many requests. Please wait a moment and try again.'
+                    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                        response = JsonResponse({'success': False, 'error': error}, status=429)
+                    else:
+                        response = HttpResponse(error, status=429, content_type='text/plain')
+                    response['Retry-After'] = str(math.ceil(wait))
+                    return response
+            return view_func(request, *args, **kwargs)
+        return _wrapped_view
+    return decorator
+
+def idempotent(view_func):
+    """Replay the first result for POSTs carrying the same idempotency key.
+
+    The key is read from the Idempotency-Key header or the idempotency_key
+    form field and is scoped to the user and the request path. Reusing a
+    key with different form data is rejected with 422. Only JSON and
+    redirect responses are stored.
+    """
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key') or request.POST.get('idempotency_key')
+        if request.method != 'POST' or not key:
+            return view_func(request, *args, **kwargs)
+
+        fingerprint = request_fingerprint(request)
+        if not claim_idempotency_key(request.user, request.path, key, fingerprint):
+            stored = get_idempotent_result(request.user, request.path, key)
+            if stored is not None:
+                stored_fingerprint, result = stored
+                if stored_fingerprint != fingerprint:
+                    return JsonResponse(
+                        {'success': False, 'error': 'This idempotency key was used for a different request.'},
+                        status=422,
+                    )
+                if result == 'pending':
+                    return JsonResponse(
+                        {'success': False, 'error': 'This request is already being processed.'},
+                        status=409,
+                    )
+                status, content_type, content, location = result
+                response = HttpResponse(content, status=status, content_type=content_type)
+                if location:
+                    response['Location'] = location
+                return response
+
+        try:
+            response = view_func(request, *args, **kwargs)
+        except BaseException:
+            release_idempotency_key(request.user, request.path, key)
+            raise
+        is_json = response.get('Content-Type', '').startswith('application/json')
+        if (response.status_code < 300 and is_json) or 300 <= response.status_code < 400:
+            store_idempotent_result(request.user, request.path, key, fingerprint, (
+                response.status_code,
+                response['Content-Type'],
+                response.content,
+                response.get('Location'),
+            ))
+        else:
+            # Let a retry run the view again
+            release_idempotency_key(request.user, request.path, key)
+        return response
+    return _wrapped_view
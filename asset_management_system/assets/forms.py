@@ -1,13 +1,41 @@
 from django import forms
 from django.contrib.auth.models import User
-from .models import Asset, AssetRequest
+from django.urls import reverse_lazy
+from .models import Asset, AssetRequest, Department
+
+class UserAutocompleteWidget(forms.Widget):
+    """Text search box backed by the user_search endpoint.
+
+    Only the selected user is looked up when rendering, so the page size does
+    not depend on the number of users. The PK is posted in a hidden input.
+    """
+    template_name = 'assets/widgets/user_autocomplete.html'
+    search_url = reverse_lazy('user_search')
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        label = ''
+        if value:
+            # self.choices is the ModelChoiceIterator of the bound field. An
+            # invalid submitted value is re-rendered with an empty label.
+            try:
+                user = self.choices.queryset.filter(pk=value).only('username', 'first_name', 'last_name').first()
+            except (ValueError, TypeError, forms.ValidationError):
+                user = None
+            if user:
+                label = user.get_full_name() or user.username
+        context['widget'].update({
+            'label': label,
+            'search_url': str(self.search_url),
+        })
+        return context
 
 class AssetForm(forms.ModelForm):
     assigned_to = forms.ModelChoiceField(
         queryset=User.objects.all(),
         required=False,
         empty_label="Not Assigned",
-        widget=forms.Select(attrs={'class': 'form-control'})
+        widget=UserAutocompleteWidget(attrs={'class': 'form-control', 'placeholder': 'Search by username or name...'})
     )
 
     class Meta:
@@ -38,4 +66,63 @@ class AssetRequestForm(forms.ModelForm):
 
     class Meta:
         model = AssetRequest
-        fields = ['purpose'] 
\ No newline at end of file
+        fields = ['purpose'] 
+
+class BulkAssetActionForm(forms.Form):
+    ACTION_CHOICES = [
+        ('status', 'Change Status'),
+        ('department', 'Move to Department'),
+        ('assign', 'Assign To'),
+        ('delete', 'Delete'),
+    ]
+
+    action = forms.ChoiceField(
+        choices=ACTION_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    asset_ids = forms.Field(required=False, widget=forms.MultipleHiddenInput)
+    select_all = forms.BooleanField(required=False, widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}))
+    status = forms.ChoiceField(
+        choices=Asset.STATUS_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    department = forms.ModelChoiceField(
+        queryset=Department.objects.order_by('name'),
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    assigned_to = forms.ModelChoiceField(
+        queryset=User.objects.all(),
+        required=False,
+        widget=UserAutocompleteWidget(attrs={'class': 'form-control', 'placeholder': 'Leave empty to unassign'})
+    )
+
+    def clean_asset_ids(self):
+        value = self.cleaned_data['asset_ids'] or []
+        try:
+            return [int(pk) for pk in value]
+        except ValueError:
+            raise forms.ValidationError('Invalid asset selection.')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        action = cleaned_data.get('action')
+        if not cleaned_data.get('select_all') and not cleaned_data.get('asset_ids'):
+            raise forms.ValidationError('Select at least one asset.')
+        if action == 'status' and not cleaned_data.get('status'):
+            self.add_error('status', 'Choose a status.')
+        if action == 'department' and not cleaned_data.get('department'):
+            self.add_error('department', 'Choose a department.')
+        return cleaned_data
+
+    def get_changes(self):
+        """Field values to apply with QuerySet.update() for the chosen action"""
+        action = self.cleaned_data['action']
+        if action == 'status':
+            return {'status': self.cleaned_data['status']}
+        if action == 'department':
+            return {'department': self.cleaned_data['department']}
+        if action == 'assign':
+            return {'assigned_to': self.cleaned_data['assigned_to']}
+        return {}
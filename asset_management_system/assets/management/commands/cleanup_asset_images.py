@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from assets.models import Asset
+
+class Command(BaseCommand):
+    help = 'Deletes stored asset images that no asset references any more'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=int, default=3600,
+            help='Keep files newer than this many seconds, which may belong to an upload still being saved',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='List the files that would be deleted without deleting them',
+        )
+
+    def handle(self, *args, **options):
+        field = Asset._meta.get_field('image')
+        storage = field.storage
+        referenced = set(Asset.objects.exclude(image='').exclude(image__isnull=True).values_list('image', flat=True))
+        cutoff = time.time() - options['min_age']
+
+        removed = 0
+        # Purging only removes files already listed and emptied directories,
+        # so it is safe while the walk is in progress
+        for name, mtime in storage.hashed_files(field.upload_to.rstrip('/')):
+            if name in referenced or mtime > cutoff:
+                continue
+            if options['dry_run']:
+                self.stdout.write(name)
+            else:
+                storage.purge(name)
+            removed += 1
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {removed} unreferenced images'))
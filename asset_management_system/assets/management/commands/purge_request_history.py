@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from assets.retention import get_retention_settings, purge_processed_requests, run_queued_purges
+
+class Command(BaseCommand):
+    help = 'Archives and deletes processed asset requests past the retention period or queued for clearing'
+
+    def add_arguments(self, parser):
+        config = get_retention_settings()
+        parser.add_argument(
+            '--days', type=int, default=config['PROCESSED_REQUEST_DAYS'],
+            help='Keep processed requests decided within this many days',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=config['CHUNK_SIZE'],
+            help='Number of rows deleted per transaction',
+        )
+        parser.add_argument(
+            '--archive-dir', default=None,
+            help='Directory for the gzipped NDJSON archive',
+        )
+        parser.add_argument(
+            '--no-archive', action='store_true',
+            help='Delete without writing an archive first',
+        )
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Run forever, purging every INTERVAL seconds',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            queued = run_queued_purges(
+                chunk_size=options['chunk_size'],
+                archive=not options['no_archive'],
+                archive_dir=options['archive_dir'],
+            )
+            if queued:
+                self.stdout.write(self.style.SUCCESS(f'Purged {queued} requests queued from the web UI'))
+
+            deleted, archive_file = purge_processed_requests(
+                days=options['days'],
+                chunk_size=options['chunk_size'],
+                archive=not options['no_archive'],
+                archive_dir=options['archive_dir'],
+            )
+            if archive_file:
+                self.stdout.write(
+                    self.style.SUCCESS(f'Purged {deleted} requests, archived to {archive_file}')
+                )
+            else:
+                self.stdout.write(self.style.SUCCESS(f'Purged {deleted} requests'))
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
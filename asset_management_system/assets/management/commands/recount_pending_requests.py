@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from assets.models import Asset
+
+class Command(BaseCommand):
+    help = 'Recomputes every asset\'s pending request count from its pending requests'
+
+    def handle(self, *args, **options):
+        updated = Asset.objects.all().recount_pending_requests()
+        self.stdout.write(self.style.SUCCESS(f'Recounted pending requests for {updated} assets'))
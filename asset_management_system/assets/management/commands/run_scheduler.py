@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from assets.scheduler import get_scheduler_settings, run_forever, tick
+
+class Command(BaseCommand):
+    help = 'Moves assets due for maintenance to maintenance, retires expired assets and clears queued request history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Run a single tick and exit',
+        )
+        parser.add_argument(
+            '--interval', type=int, default=get_scheduler_settings()['INTERVAL'],
+            help='Seconds between ticks when running continuously',
+        )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            triggered, retired, purged = tick()
+            self.stdout.write(self.style.SUCCESS(
+                f'Moved {triggered} assets to maintenance, retired {retired}, '
+                f'purged {purged} queued history requests'
+            ))
+            return
+        self.stdout.write(f"Scheduler running every {options['interval']}s (Ctrl+C to stop)")
+        try:
+            run_forever(options['interval'])
+        except KeyboardInterrupt:
+            pass
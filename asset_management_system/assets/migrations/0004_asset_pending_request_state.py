@@ -0,0 +1,49 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:03
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_pending_state(apps, schema_editor):
+    Asset = apps.get_model('assets', 'Asset')
+    AssetRequest = apps.get_model('assets', 'AssetRequest')
+    pending = AssetRequest.objects.filter(approved__isnull=True)
+
+    # Keep the oldest pending request per (asset, user); reject the duplicates
+    duplicates = (
+        pending.values('asset_id', 'user_id')
+        .annotate(n=Count('id'))
+        .filter(n__gt=1)
+    )
+    for dup in duplicates:
+        ids = list(
+            pending.filter(asset_id=dup['asset_id'], user_id=dup['user_id'])
+            .order_by('request_date', 'id')
+            .values_list('id', flat=True)
+        )
+        AssetRequest.objects.filter(id__in=ids[1:]).update(approved=False)
+
+    for row in pending.values('asset_id').annotate(n=Count('id')):
+        Asset.objects.filter(pk=row['asset_id']).update(pending_request_count=row['n'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0003_create_initial_departments'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='pending_request_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_pending_state, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='assetrequest',
+            constraint=models.UniqueConstraint(condition=models.Q(('approved__isnull', True)), fields=('asset', 'user'), name='unique_pending_request_per_user'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def seed_closure(apps, schema_editor):
+    # Existing departments are all roots, so each only links to itself
+    Department = apps.get_model('assets', 'Department')
+    DepartmentClosure = apps.get_model('assets', 'DepartmentClosure')
+    DepartmentClosure.objects.bulk_create([
+        DepartmentClosure(ancestor_id=pk, descendant_id=pk, depth=0)
+        for pk in Department.objects.values_list('pk', flat=True)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0004_asset_pending_request_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='department',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='assets.department'),
+        ),
+        migrations.CreateModel(
+            name='DepartmentClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='assets.department')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='assets.department')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'ancestor'], name='assets_depa_descend_56f6d2_idx')],
+                'constraints': [models.UniqueConstraint(fields=('ancestor', 'descendant'), name='unique_department_closure')],
+            },
+        ),
+        migrations.RunPython(seed_closure, migrations.RunPython.noop),
+    ]
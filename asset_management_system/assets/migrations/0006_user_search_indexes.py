@@ -0,0 +1,29 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Expression indexes backing the prefix search in views.user_search.
+
+    The SQL targets auth_user directly, so this depends on the auth app
+    rather than on a swappable user model.
+    """
+
+    dependencies = [
+        ('assets', '0005_department_hierarchy'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX assets_user_lower_username_idx ON auth_user (LOWER(username));',
+            'DROP INDEX IF EXISTS assets_user_lower_username_idx;',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX assets_user_lower_first_name_idx ON auth_user (LOWER(first_name));',
+            'DROP INDEX IF EXISTS assets_user_lower_first_name_idx;',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX assets_user_lower_last_name_idx ON auth_user (LOWER(last_name));',
+            'DROP INDEX IF EXISTS assets_user_lower_last_name_idx;',
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0006_user_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaintenanceSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('interval', models.DurationField(help_text='Time between maintenance runs')),
+                ('next_due', models.DateTimeField(db_index=True)),
+                ('last_triggered', models.DateTimeField(blank=True, null=True)),
+                ('retire_on', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('asset', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='maintenance_schedule', to='assets.asset')),
+            ],
+            options={
+                'ordering': ['next_due'],
+            },
+        ),
+    ]
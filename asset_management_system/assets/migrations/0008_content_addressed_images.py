@@ -0,0 +1,19 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:15
+
+import assets.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0007_maintenance_schedule'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='asset',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=assets.storage.asset_image_storage, upload_to='assets/'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.4 on 2026-10-19 12:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0009_history_purge'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='department',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='children', to='assets.department'),
+        ),
+    ]
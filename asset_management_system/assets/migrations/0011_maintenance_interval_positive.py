@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-19 12:20
+
+import datetime
+from django.db import migrations, models
+
+
+def fix_non_positive_intervals(apps, schema_editor):
+    # Rows saved before the constraint existed would make AddConstraint fail;
+    # give them a daily interval so the scheduler can advance them
+    MaintenanceSchedule = apps.get_model('assets', 'MaintenanceSchedule')
+    MaintenanceSchedule.objects.filter(interval__lte=datetime.timedelta(0)).update(
+        interval=datetime.timedelta(days=1)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0010_protect_department_deletes'),
+    ]
+
+    operations = [
+        migrations.RunPython(fix_non_positive_intervals, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='maintenanceschedule',
+            constraint=models.CheckConstraint(condition=models.Q(('interval__gt', datetime.timedelta(0))), name='maintenance_interval_positive'),
+        ),
+    ]
@@ -1,12 +1,134 @@
-from django.db import models
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import Count, Exists, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from .storage import asset_image_storage
 
 class Department(models.Model):
     name = models.CharField(max_length=100, unique=True)
+    # PROTECT so deleting a department cannot silently take its subtree with it
+    parent = models.ForeignKey('self', on_delete=models.PROTECT, null=True, blank=True, related_name='children')
 
     def __str__(self):
         return self.name
 
+    def clean(self):
+        self.check_parent()
+
+    def check_parent(self):
+        """Reject a parent inside this department's own subtree"""
+        if self.pk and self.parent_id and DepartmentClosure.objects.filter(
+            ancestor_id=self.pk, descendant_id=self.parent_id
+        ).exists():
+            raise ValidationError({'parent': 'A department cannot be placed under itself or one of its sub-departments.'})
+
+    def save(self, *args, **kwargs):
+        is_new = self.pk is None
+        old_parent_id = None
+        if not is_new:
+            old_parent_id = Department.objects.filter(pk=self.pk).values_list('parent_id', flat=True).first()
+        with transaction.atomic():
+            if not is_new and old_parent_id != self.parent_id:
+                self.check_parent()
+            super().save(*args, **kwargs)
+            if is_new:
+                DepartmentClosure.link(self)
+            elif old_parent_id != self.parent_id:
+                DepartmentClosure.move(self)
+
+    def subtree(self):
+        """This department and every department below it"""
+        return Department.objects.filter(ancestor_links__ancestor=self)
+
+class DepartmentClosure(models.Model):
+    """Closure table holding one row per (ancestor, descendant) pair,
+    including each department paired with itself at depth 0."""
+    ancestor = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='unique_department_closure'),
+        ]
+        indexes = [
+            models.Index(fields=['descendant', 'ancestor']),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor} > {self.descendant} ({self.depth})"
+
+    @classmethod
+    def link(cls, department):
+        """Add closure rows for a newly created leaf department"""
+        rows = [cls(ancestor=department, descendant=department, depth=0)]
+        if department.parent_id:
+            rows += [
+                cls(ancestor_id=link.ancestor_id, descendant=department, depth=link.depth + 1)
+                for link in cls.objects.filter(descendant_id=department.parent_id)
+            ]
+        cls.objects.bulk_create(rows)
+
+    @classmethod
+    def move(cls, department):
+        """Re-hang the subtree rooted at department under its new parent"""
+        subtree = list(cls.objects.filter(ancestor=department).values_list('descendant_id', 'depth'))
+        subtree_ids = [pk for pk, _ in subtree]
+        # Drop links from the old ancestors into the subtree
+        cls.objects.filter(descendant_id__in=subtree_ids).exclude(ancestor_id__in=subtree_ids).delete()
+        if department.parent_id:
+            ancestors = cls.objects.filter(descendant_id=department.parent_id).values_list('ancestor_id', 'depth')
+            cls.objects.bulk_create([
+                cls(ancestor_id=ancestor_id, descendant_id=pk, depth=up + 1 + down)
+                for ancestor_id, up in ancestors
+                for pk, down in subtree
+            ])
+
+    @classmethod
+    def rebuild(cls):
+        """Recompute the whole table from Department.parent"""
+        with transaction.atomic():
+            cls.objects.all().delete()
+            parents = dict(Department.objects.values_list('pk', 'parent_id'))
+            rows = []
+            for pk in parents:
+                node, depth = pk, 0
+                while node is not None:
+                    rows.append(cls(ancestor_id=node, descendant_id=pk, depth=depth))
+                    node, depth = parents[node], depth + 1
+            cls.objects.bulk_create(rows, batch_size=500)
+
+class AssetQuerySet(models.QuerySet):
+    def with_request_state(self, user):
+        """Annotate whether `user` has a pending request for each asset"""
+        return self.annotate(
+            user_has_pending_request=Exists(
+                AssetRequest.objects.filter(
+                    asset=OuterRef('pk'),
+                    user=user,
+                    approved__isnull=True,
+                )
+            )
+        )
+
+    def recount_pending_requests(self):
+        """Recompute pending_request_count from AssetRequest for these assets.
+
+        The counter is kept up to date by the request views; this repairs it
+        after changes made elsewhere (admin edits, cascaded deletes).
+        """
+        pending = (
+            AssetRequest.objects.filter(asset=OuterRef('pk'), approved__isnull=True)
+            .order_by()
+            .values('asset')
+            .annotate(count=Count('pk'))
+            .values('count')
+        )
+        return self.update(pending_request_count=Coalesce(Subquery(pending), 0))
+
 class Asset(models.Model):
     STATUS_CHOICES = [
         ('available', 'Available'),
@@ -31,7 +153,11 @@ class Asset(models.Model):
     assigned_to = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='assigned_assets')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    image = models.ImageField(upload_to='assets/', null=True, blank=True)
+    image = models.ImageField(upload_to='assets/', storage=asset_image_storage, null=True, blank=True)
+    # Denormalized count of AssetRequest rows with approved=None
+    pending_request_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = AssetQuerySet.as_manager()
 
     def __str__(self):
         return self.name
@@ -52,3 +178,53 @@ class AssetRequest(models.Model):
 
     class Meta:
         ordering = ['-request_date']
+        constraints = [
+            # Also serves as the index over pending (asset, user) pairs
+            models.UniqueConstraint(
+                fields=['asset', 'user'],
+                condition=Q(approved__isnull=True),
+                name='unique_pending_request_per_user',
+            ),
+        ]
+
+class MaintenanceSchedule(models.Model):
+    """Recurring maintenance (and optional retirement) for one asset.
+
+    next_due is indexed so a scheduler tick only range-scans the due rows.
+    """
+    asset = models.OneToOneField(Asset, on_delete=models.CASCADE, related_name='maintenance_schedule')
+    interval = models.DurationField(help_text="Time between maintenance runs")
+    next_due = models.DateTimeField(db_index=True)
+    last_triggered = models.DateTimeField(null=True, blank=True)
+    retire_on = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    def __str__(self):
+        return f"Maintenance for {self.asset.name} due {self.next_due:%Y-%m-%d}"
+
+    def clean(self):
+        if self.interval is not None and self.interval.total_seconds() <= 0:
+            raise ValidationError({'interval': 'The maintenance interval must be positive.'})
+
+    class Meta:
+        ordering = ['next_due']
+        constraints = [
+            # A zero interval would leave the schedule due forever
+            models.CheckConstraint(
+                condition=Q(interval__gt=timedelta(0)),
+                name='maintenance_interval_positive',
+            ),
+        ]
+
+class HistoryPurge(models.Model):
+    """A request to clear processed request history up to `cutoff`,
+    carried out by the purge_request_history management command."""
+    cutoff = models.DateTimeField()
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    requested_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    def __str__(self):
+        return f"History purge up to {self.cutoff:%Y-%m-%d %H:%M}"
+
+    class Meta:
+        ordering = ['-requested_at']
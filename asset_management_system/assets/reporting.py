@@ -0,0 +1,363 @@
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count
+from pypdf import PdfReader
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+from .models import Asset, Department
+
+# Colors to match website theme
+PRIMARY_COLOR = colors.HexColor('#00c853')
+TEXT_COLOR = colors.HexColor('#2c3e50')
+BORDER_COLOR = colors.HexColor('#e0e0e0')
+LIGHT_BG = colors.HexColor('#e8f5e9')
+
+# Styles are built once per process and shared by every section
+STYLES = getSampleStyleSheet()
+
+TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=STYLES['Heading1'],
+    fontSize=24,
+    textColor=TEXT_COLOR,
+    spaceAfter=30,
+    alignment=1  # Center alignment
+)
+
+HEADING_STYLE = ParagraphStyle(
+    'CustomHeading',
+    parent=STYLES['Heading2'],
+    fontSize=16,
+    textColor=PRIMARY_COLOR,
+    spaceBefore=20,
+    spaceAfter=15
+)
+
+NORMAL_STYLE = ParagraphStyle(
+    'CustomNormal',
+    parent=STYLES['Normal'],
+    textColor=TEXT_COLOR,
+    fontSize=10,
+    spaceBefore=10,
+    spaceAfter=10
+)
+
+TABLE_STYLE = TableStyle([
+    # Header style
+    ('BACKGROUND', (0, 0), (-1, 0), PRIMARY_COLOR),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    # Data rows
+    ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+    ('TEXTCOLOR', (0, 1), (-1, -1), TEXT_COLOR),
+    ('ALIGN', (-1, 0), (-1, -1), 'CENTER'),  # Center align the last column
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 10),
+    ('GRID', (0, 0), (-1, -1), 1, BORDER_COLOR),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, LIGHT_BG]),
+    ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
+    ('TOPPADDING', (0, 1), (-1, -1), 8),
+])
+
+SUMMARY_COL_WIDTHS = [300, 100]
+DETAIL_COL_WIDTHS = [50, 170, 110, 90, 100]
+
+DEFAULT_REPORTS = {
+    'WORKERS': None,  # None means one per CPU, 0 or 1 renders in-process
+    'ROWS_PER_PART': 500,
+}
+
+
+def get_report_settings():
+    """Merge ASSET_REPORTS from settings over the defaults"""
+    config = dict(DEFAULT_REPORTS)
+    config.update(getattr(settings, 'ASSET_REPORTS', {}))
+    if config['WORKERS'] is None:
+        config['WORKERS'] = min(4, os.cpu_count() or 1)
+    return config
+
+
+def summary_table(header, rows):
+    table = Table([header] + rows, colWidths=SUMMARY_COL_WIDTHS)
+    table.setStyle(TABLE_STYLE)
+    return table
+
+
+def summary_flowables(generated_on):
+    """Title page with the category, status and department tables"""
+    category_labels = dict(Asset.CATEGORY_CHOICES)
+    status_labels = dict(Asset.STATUS_CHOICES)
+    categories = Asset.objects.values('category').annotate(count=Count('category')).order_by('category')
+    statuses = Asset.objects.values('status').annotate(count=Count('status')).order_by('status')
+    departments = Asset.objects.values('department__name').annotate(count=Count('department')).order_by('department__name')
+
+    return [
+        Paragraph("GridSet", TITLE_STYLE),
+        Paragraph("Asset Management Report", HEADING_STYLE),
+        Paragraph(f"Generated on: {generated_on.strftime('%B %d, %Y')}", NORMAL_STYLE),
+        Spacer(1, 20),
+        Paragraph("Asset Distribution", HEADING_STYLE),
+        summary_table(['Category', 'Count'], [
+            [category_labels[cat['category']], cat['count']] for cat in categories
+        ]),
+        Spacer(1, 20),
+        Paragraph("Status Distribution", HEADING_STYLE),
+        summary_table(['Status', 'Count'], [
+            [status_labels[status['status']], status['count']] for status in statuses
+        ]),
+        Spacer(1, 20),
+        Paragraph("Department Distribution", HEADING_STYLE),
+        summary_table(['Department', 'Count'], [
+            [dept['department__name'], dept['count']] for dept in departments
+        ]),
+    ]
+
+
+def department_flowables(part):
+    """Detail table for one slice of a department's assets"""
+    department_id, department_name, start_pk, end_pk, continued = part
+    title = f"{department_name} (continued)" if continued else department_name
+    elements = [Paragraph(escape(title), HEADING_STYLE)]
+    if start_pk is None:
+        elements.append(Paragraph("No assets in this department.", NORMAL_STYLE))
+        return elements
+
+    category_labels = dict(Asset.CATEGORY_CHOICES)
+    status_labels = dict(Asset.STATUS_CHOICES)
+    rows = [['ID', 'Name', 'Category', 'Status', 'Assigned To']]
+    assets = (
+        Asset.objects.filter(department_id=department_id, pk__gte=start_pk, pk__lte=end_pk)
+        .order_by('pk')
+        .values_list('pk', 'name', 'category', 'status', 'assigned_to__username')
+    )
+    for pk, name, category, status, username in assets.iterator():
+        rows.append([
+            f"#{pk}",
+            Paragraph(escape(name), NORMAL_STYLE),
+            category_labels.get(category, category),
+            status_labels.get(status, status),
+            username or '-',
+        ])
+    table = Table(rows, colWidths=DETAIL_COL_WIDTHS, repeatRows=1)
+    table.setStyle(TABLE_STYLE)
+    elements.append(table)
+    return elements
+
+
+def department_parts(rows_per_part):
+    """Yield (department_id, name, start_pk, end_pk, continued) slices.
+
+    Asset keys are streamed per department, so only the slice boundaries are
+    held in memory no matter how many assets a department has.
+    """
+    for department_id, name in Department.objects.order_by('name').values_list('pk', 'name'):
+        pks = (
+            Asset.objects.filter(department_id=department_id)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+            .iterator(chunk_size=rows_per_part)
+        )
+        start_pk = end_pk = None
+        count = 0
+        continued = False
+        for pk in pks:
+            if start_pk is None:
+                start_pk = pk
+            end_pk = pk
+            count += 1
+            if count == rows_per_part:
+                yield (department_id, name, start_pk, end_pk, continued)
+                start_pk = None
+                count = 0
+                continued = True
+        if start_pk is not None or not continued:
+            yield (department_id, name, start_pk, end_pk, continued)
+
+
+def render_section(section, path):
+    """Render one section to a standalone PDF file at path"""
+    kind, payload = section
+    doc = SimpleDocTemplate(path, pagesize=letter)
+    if kind == 'summary':
+        doc.build(summary_flowables(payload))
+    else:
+        doc.build(department_flowables(payload))
+    return path
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _can_use_workers():
+    # Worker processes open their own connections, which cannot see an
+    # in-memory SQLite database (e.g. the one used by the test runner).
+    for conn in connections.all():
+        if conn.vendor == 'sqlite' and conn.is_in_memory_db():
+            return False
+    return True
+
+
+class StreamingPdfMerger:
+    """Concatenate PDF files into output one part at a time.
+
+    Each part is read, its objects renumbered and written straight to
+    output, and the part is dropped before the next one is opened. Only the
+    byte offset of every object and a reference per page are kept, so memory
+    does not grow with the size of the parts already written. The catalog
+    and page tree are written last, as objects 1 and 2.
+    """
+    CATALOG = 1
+    PAGES = 2
+
+    def __init__(self, output):
+        self.output = output
+        self.position = 0
+        self.offsets = {}
+        self.kids = []
+        self.next_number = self.PAGES + 1
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def _write(self, data):
+        self.output.write(data)
+        self.position += len(data)
+
+    def _write_object(self, number, obj):
+        self.offsets[number] = self.position
+        self._write(f'{number} 0 obj\n'.encode())
+        counter = _CountingStream(self.output)
+        obj.write_to_stream(counter)
+        self.position += counter.written
+        self._write(b'\nendobj\n')
+
+    def append(self, path):
+        reader = PdfReader(path)
+        numbers = {}
+        queue = deque()
+
+        def reference(indirect):
+            key = (indirect.idnum, indirect.generation)
+            if key not in numbers:
+                numbers[key] = self.next_number
+                self.next_number += 1
+                queue.append(indirect)
+            return IndirectObject(numbers[key], 0, None)
+
+        def renumber(obj):
+            if isinstance(obj, IndirectObject):
+                return reference(obj)
+            if isinstance(obj, DictionaryObject):
+                # dict.items gives the raw values, without resolving references
+                for key, value in list(dict.items(obj)):
+                    obj[key] = renumber(value)
+            elif isinstance(obj, ArrayObject):
+                for index, value in enumerate(list.__iter__(obj)):
+                    obj[index] = renumber(value)
+            return obj
+
+        # reader.pages copies inherited attributes onto each page, so the
+        # part's own page tree can be left behind
+        page_keys = set()
+        for page in reader.pages:
+            page_keys.add(page.indirect_reference.idnum)
+            self.kids.append(reference(page.indirect_reference))
+        while queue:
+            indirect = queue.popleft()
+            obj = indirect.get_object()
+            is_page = indirect.idnum in page_keys
+            if is_page:
+                del obj['/Parent']
+            obj = renumber(obj)
+            if is_page:
+                obj[NameObject('/Parent')] = IndirectObject(self.PAGES, 0, None)
+            self._write_object(numbers[(indirect.idnum, indirect.generation)], obj)
+
+    def close(self):
+        self._write_object(self.PAGES, DictionaryObject({
+            NameObject('/Type'): NameObject('/Pages'),
+            NameObject('/Kids'): ArrayObject(self.kids),
+            NameObject('/Count'): NumberObject(len(self.kids)),
+        }))
+        self._write_object(self.CATALOG, DictionaryObject({
+            NameObject('/Type'): NameObject('/Catalog'),
+            NameObject('/Pages'): IndirectObject(self.PAGES, 0, None),
+        }))
+        xref = self.position
+        size = self.next_number
+        self._write(f'xref\n0 {size}\n0000000000 65535 f \n'.encode())
+        for number in range(1, size):
+            self._write(f'{self.offsets[number]:010d} 00000 n \n'.encode())
+        self._write(f'trailer\n<< /Size {size} /Root {self.CATALOG} 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode())
+
+
+class _CountingStream:
+    """Write-through wrapper that counts the bytes written"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.written = 0
+
+    def write(self, data):
+        self.stream.write(data)
+        self.written += len(data)
+
+
+def build_report(output, generated_on=None):
+    """Write the full PDF report (summary plus one section per department) to output.
+
+    Sections are rendered to temporary files, in a process pool when
+    WORKERS > 1, with at most WORKERS * 2 sections in flight, and streamed
+    into output in order by StreamingPdfMerger. Each worker holds one
+    ROWS_PER_PART slice and the parent one part at a time, so memory stays
+    flat however many assets there are.
+
+    The pool forks the calling process. Forking a multi-threaded process
+    (a threaded WSGI server, or runserver) is unsafe, so set WORKERS to 1
+    there to render in-process.
+    """
+    generated_on = generated_on or datetime.now()
+    config = get_report_settings()
+
+    # Slice boundaries only (one small tuple per ROWS_PER_PART assets), read
+    # before any worker is forked so no connection is open across the fork
+    sections = [('summary', generated_on)]
+    sections += [('department', part) for part in department_parts(config['ROWS_PER_PART'])]
+
+    merger = StreamingPdfMerger(output)
+    with tempfile.TemporaryDirectory(prefix='asset-report-') as tmp_dir:
+        paths = (os.path.join(tmp_dir, f'{index:06d}.pdf') for index in range(len(sections)))
+        if config['WORKERS'] > 1 and _can_use_workers():
+            connections.close_all()
+            window = config['WORKERS'] * 2
+            with ProcessPoolExecutor(max_workers=config['WORKERS'], initializer=_init_worker) as pool:
+                in_flight = deque()
+                for section, path in zip(sections, paths):
+                    in_flight.append(pool.submit(render_section, section, path))
+                    if len(in_flight) >= window:
+                        _append_part(merger, in_flight.popleft().result())
+                while in_flight:
+                    _append_part(merger, in_flight.popleft().result())
+        else:
+            for section, path in zip(sections, paths):
+                _append_part(merger, render_section(section, path))
+    merger.close()
+
+
+def _append_part(merger, path):
+    merger.append(path)
+    os.remove(path)
@@ -0,0 +1,113 @@
+import gzip
+import json
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import AssetRequest, HistoryPurge
+
+DEFAULT_RETENTION = {
+    'PROCESSED_REQUEST_DAYS': 90,
+    'CHUNK_SIZE': 500,
+    'ARCHIVE_DIR': None,
+}
+
+
+def get_retention_settings():
+    """Merge ASSET_RETENTION from settings over the defaults"""
+    config = dict(DEFAULT_RETENTION)
+    config.update(getattr(settings, 'ASSET_RETENTION', {}))
+    if config['ARCHIVE_DIR'] is None:
+        config['ARCHIVE_DIR'] = Path(settings.BASE_DIR) / 'archive'
+    return config
+
+
+def processed_requests_before(cutoff):
+    """Processed (approved or rejected) requests decided before cutoff"""
+    return AssetRequest.objects.filter(
+        Q(approval_date__lt=cutoff) | Q(approval_date__isnull=True),
+        approved__isnull=False,
+    ).order_by('pk')
+
+
+def archive_path(archive_dir, now=None):
+    now = now or timezone.now()
+    return Path(archive_dir) / f"asset_requests_{now.strftime('%Y%m%dT%H%M%S')}.ndjson.gz"
+
+
+def purge_processed_requests(days=None, chunk_size=None, archive=True,
+                             archive_dir=None, now=None, cutoff=None, max_chunks=None):
+    """Archive and delete processed requests older than `days` days.
+
+    Rows are removed in primary-key chunks of `chunk_size`, each in its own
+    short transaction, so the database is never locked for the whole purge.
+    When `archive` is set every chunk is appended to a gzipped NDJSON file
+    before it is deleted. An explicit `cutoff` overrides `days`, and
+    `max_chunks` stops after that many chunks. Returns
+    (deleted_count, archive_file_or_None).
+    """
+    config = get_retention_settings()
+    if days is None:
+        days = config['PROCESSED_REQUEST_DAYS']
+    chunk_size = chunk_size or config['CHUNK_SIZE']
+    now = now or timezone.now()
+    if cutoff is None:
+        cutoff = now - timedelta(days=days)
+
+    queryset = processed_requests_before(cutoff)
+    if not queryset.exists():
+        return 0, None
+
+    archive_file = None
+    out = None
+    if archive:
+        archive_file = archive_path(archive_dir or config['ARCHIVE_DIR'], now)
+        archive_file.parent.mkdir(parents=True, exist_ok=True)
+        out = gzip.open(archive_file, 'at', encoding='utf-8')
+
+    deleted = 0
+    chunks = 0
+    last_pk = 0
+    try:
+        while max_chunks is None or chunks < max_chunks:
+            rows = list(
+                queryset.filter(pk__gt=last_pk).values(
+                    'id', 'asset_id', 'asset__name', 'user_id', 'user__username',
+                    'purpose', 'request_date', 'approved', 'approval_date',
+                )[:chunk_size]
+            )
+            if not rows:
+                break
+            if out is not None:
+                for row in rows:
+                    out.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+                out.flush()
+            ids = [row['id'] for row in rows]
+            with transaction.atomic():
+                count, _ = AssetRequest.objects.filter(pk__in=ids).delete()
+            deleted += count
+            chunks += 1
+            last_pk = ids[-1]
+    finally:
+        if out is not None:
+            out.close()
+
+    return deleted, archive_file
+
+
+def run_queued_purges(**kwargs):
+    """Carry out history purges queued by clear_request_history.
+
+    Returns the number of requests deleted.
+    """
+    deleted = 0
+    for purge in HistoryPurge.objects.filter(completed_at__isnull=True).order_by('requested_at'):
+        count, _ = purge_processed_requests(cutoff=purge.cutoff, **kwargs)
+        deleted += count
+        HistoryPurge.objects.filter(pk=purge.pk).update(completed_at=timezone.now())
+    return deleted
@@ -0,0 +1,152 @@
+import logging
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection, transaction
+from django.db.models import DateTimeField, ExpressionWrapper, F, Value
+from django.utils import timezone
+
+from .models import Asset, MaintenanceSchedule
+from .retention import run_queued_purges
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCHEDULER = {
+    'IN_PROCESS': False,
+    'INTERVAL': 60,
+    'BATCH_SIZE': 500,
+    'LOCK_TIMEOUT': 300,  # seconds before a crashed worker's tick lock expires
+}
+
+TICK_LOCK_KEY = 'scheduler:tick'
+
+# Statuses a tick is allowed to move to maintenance
+SCHEDULABLE_STATUSES = ['available', 'in_use']
+
+
+def get_scheduler_settings():
+    """Merge ASSET_SCHEDULER from settings over the defaults"""
+    config = dict(DEFAULT_SCHEDULER)
+    config.update(getattr(settings, 'ASSET_SCHEDULER', {}))
+    return config
+
+
+def _due_batch(queryset, field, now, batch_size):
+    # Ordered range scan over the field's index, stopped after one batch.
+    # Called inside the batch's transaction: where the database supports it
+    # the rows are locked and rows locked by another worker are skipped, so
+    # concurrent ticks take disjoint batches.
+    queryset = queryset.filter(**{f'{field}__lte': now}).order_by(field, 'pk')
+    if connection.features.has_select_for_update_skip_locked:
+        queryset = queryset.select_for_update(skip_locked=True)
+    return list(queryset.values_list('pk', 'asset_id')[:batch_size])
+
+
+def run_due_maintenance(now=None, batch_size=None):
+    """Move assets whose maintenance is due to 'maintenance', in batches.
+
+    Each batch moves the assets with one UPDATE and advances next_due by the
+    schedule's interval with another, so the batch is not picked up again.
+    Returns the number of assets moved; schedules whose asset is retired or
+    already in maintenance are advanced without counting.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or get_scheduler_settings()['BATCH_SIZE']
+    next_due = ExpressionWrapper(Value(now) + F('interval'), output_field=DateTimeField())
+    # Non-positive intervals are rejected by a check constraint; filtering
+    # them too keeps a bad row from being re-selected forever
+    schedules = MaintenanceSchedule.objects.filter(interval__gt=timedelta(0))
+    triggered = 0
+    previous = None
+    while True:
+        with transaction.atomic():
+            due = _due_batch(schedules, 'next_due', now, batch_size)
+            if not due or due == previous:
+                # Nothing due, or the last batch did not move past now
+                return triggered
+            previous = due
+            triggered += Asset.objects.filter(
+                pk__in=[asset_id for _, asset_id in due],
+                status__in=SCHEDULABLE_STATUSES,
+            ).update(status='maintenance', updated_at=now)
+            MaintenanceSchedule.objects.filter(pk__in=[pk for pk, _ in due]).update(
+                next_due=next_due,
+                last_triggered=now,
+            )
+
+
+def run_due_retirements(now=None, batch_size=None):
+    """Retire assets past their retire_on date and drop their schedules"""
+    now = now or timezone.now()
+    batch_size = batch_size or get_scheduler_settings()['BATCH_SIZE']
+    retired = 0
+    while True:
+        with transaction.atomic():
+            due = _due_batch(MaintenanceSchedule.objects.all(), 'retire_on', now, batch_size)
+            if not due:
+                return retired
+            retired += Asset.objects.filter(pk__in=[asset_id for _, asset_id in due]).update(
+                status='retired', updated_at=now
+            )
+            MaintenanceSchedule.objects.filter(pk__in=[pk for pk, _ in due]).delete()
+
+
+def tick(now=None):
+    """Run one scheduler pass; returns (maintenance_triggered, retired, purged).
+
+    Besides maintenance and retirement, a pass carries out the history
+    purges queued by the Clear History button.
+
+    With IN_PROCESS every web worker runs a scheduler, so a pass first takes
+    a lock in the cache and is skipped while another worker holds it. The
+    lock only spans processes with a shared cache backend; without one the
+    row locks taken by _due_batch still keep batches disjoint on databases
+    that support SKIP LOCKED.
+    """
+    now = now or timezone.now()
+    token = uuid.uuid4().hex
+    if not cache.add(TICK_LOCK_KEY, token, get_scheduler_settings()['LOCK_TIMEOUT']):
+        logger.debug('Scheduler tick skipped, another worker holds the lock')
+        return 0, 0, 0
+    try:
+        retired = run_due_retirements(now)
+        triggered = run_due_maintenance(now)
+        purged = run_queued_purges()
+    finally:
+        # Only release our own lock, not one taken after ours timed out
+        if cache.get(TICK_LOCK_KEY) == token:
+            cache.delete(TICK_LOCK_KEY)
+    return triggered, retired, purged
+
+
+def run_forever(interval=None, stop_event=None):
+    """Tick every `interval` seconds until stop_event is set"""
+    interval = interval or get_scheduler_settings()['INTERVAL']
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        close_old_connections()
+        try:
+            triggered, retired, purged = tick()
+            if triggered or retired or purged:
+                logger.info(
+                    'Scheduler moved %d assets to maintenance, retired %d, purged %d requests',
+                    triggered, retired, purged,
+                )
+        except Exception:
+            logger.exception('Scheduler tick failed')
+        stop_event.wait(interval)
+
+
+_thread = None
+
+
+def start_in_process():
+    """Start the scheduler on a daemon thread, once per process"""
+    global _thread
+    if _thread is None:
+        _thread = threading.Thread(target=run_forever, name='asset-scheduler', daemon=True)
+        _thread.start()
+    return _thread
@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete
+from django.dispatch import Signal, receiver
+
+from .models import Asset, AssetRequest
+
+# Sent once per bulk operation from views.asset_bulk_action, rather than once
+# per asset. Arguments: action, changes (field -> value, empty for delete)
+# and count (number of assets affected).
+assets_bulk_changed = Signal()
+
+
+@receiver(post_delete, sender=AssetRequest)
+def recount_after_pending_request_delete(sender, instance, origin=None, **kwargs):
+    """Keep pending_request_count right when a pending request is deleted
+    outside the request views, e.g. in admin or by deleting its user"""
+    if instance.approved is not None:
+        return
+    # Nothing to fix when the asset itself is being deleted
+    if isinstance(origin, Asset) or getattr(origin, 'model', None) is Asset:
+        return
+    Asset.objects.filter(pk=instance.asset_id).recount_pending_requests()
@@ -0,0 +1,114 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+HASH_ALGORITHM = 'sha256'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage that names files after the hash of their content.
+
+    Uploads are streamed chunk by chunk into a temporary file in the target
+    directory while being hashed, then moved to
+    ``<upload_to>/<h[:2]>/<h[2:4]>/<hash><ext>``. An upload whose content is
+    already stored is discarded and the existing name is returned, so
+    identical files are kept once no matter how many records point at them.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is only known once the content has been hashed
+        return name
+
+    def _save(self, name, content):
+        directory, filename = posixpath.split(name)
+        ext = os.path.splitext(filename)[1].lower()
+        tmp_dir = self.path(directory or '.')
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        digest = hashlib.new(HASH_ALGORITHM)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    tmp.write(chunk)
+
+            content_hash = digest.hexdigest()
+            final_name = posixpath.join(directory, content_hash[:2], content_hash[2:4], content_hash + ext)
+            final_path = self.path(final_name)
+            if os.path.exists(final_path):
+                os.remove(tmp_path)
+                # Mark the file as in use again, so cleanup_asset_images
+                # treats it as new and does not remove it
+                os.utime(final_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(tmp_path, self.file_permissions_mode)
+                # Atomic on POSIX: a concurrent identical upload just
+                # replaces the file with the same bytes
+                os.replace(tmp_path, final_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return final_name
+
+    def delete(self, name):
+        # Content may be shared by several records, so stored files are
+        # never removed through the storage API; the cleanup_asset_images
+        # command removes the ones nothing references
+        pass
+
+    def hashed_files(self, directory=''):
+        """Yield (name, mtime) for every content-addressed file and leftover
+        upload temp file under directory"""
+        root = self.path(directory or '.')
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                if not (is_content_addressed(filename) or filename.startswith('.upload-')):
+                    continue
+                path = os.path.join(dirpath, filename)
+                name = posixpath.join(directory, os.path.relpath(path, root).replace(os.sep, '/'))
+                yield name, os.path.getmtime(path)
+
+    def purge(self, name):
+        """Remove a stored file, and its hash directories once they are empty"""
+        path = self.path(name)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        root = self.path('.')
+        directory = os.path.dirname(path)
+        # At most the two hash levels, never the upload_to directory itself
+        for _ in range(2):
+            if directory == root or not is_hash_shard(os.path.basename(directory)):
+                break
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
+
+
+def is_content_addressed(name):
+    """True for names produced by ContentAddressedStorage"""
+    stem = os.path.splitext(posixpath.basename(name))[0]
+    return len(stem) == hashlib.new(HASH_ALGORITHM).digest_size * 2 and all(
+        c in '0123456789abcdef' for c in stem
+    )
+
+
+def is_hash_shard(dirname):
+    """True for the two-character directories files are sharded into"""
+    return len(dirname) == 2 and all(c in '0123456789abcdef' for c in dirname)
+
+
+def asset_image_storage():
+    return ContentAddressedStorage()
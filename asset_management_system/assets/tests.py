@@ -1,3 +1,628 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.models import ProtectedError
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Asset, AssetRequest, Department, DepartmentClosure, HistoryPurge, MaintenanceSchedule
+from .retention import purge_processed_requests, run_queued_purges
+from .scheduler import TICK_LOCK_KEY, run_due_maintenance, tick
+from . import throttling
+from .throttling import SlidingWindow, claim_idempotency_key, get_idempotent_result, request_fingerprint
+
+# Budgets for a fresh process that runs django.setup() and loads the URLconf,
+# which is what every worker and management command pays on startup.
+STARTUP_TIME_BUDGET = 2.0  # seconds
+STARTUP_RSS_BUDGET = 64  # MiB
+HEAVY_MODULES = ['reportlab', 'pypdf']
+
+STARTUP_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+import {urlconf}
+elapsed = time.perf_counter() - start
+try:
+    # Peak RSS of this process image. ru_maxrss can report the parent's
+    # peak on Linux, which would make the result depend on the test runner.
+    with open('/proc/self/status') as status:
+        rss = next(int(line.split()[1]) for line in status if line.startswith('VmHWM:'))
+except (OSError, StopIteration):
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss //= 1024  # bytes on macOS, KiB elsewhere
+print(json.dumps({{
+    'seconds': elapsed,
+    'rss_mib': rss / 1024,
+    'modules': sorted(m for m in {heavy!r} if m in sys.modules),
+}}))
+"""
+
+
+@skipIf(sys.platform == 'win32', 'the resource module is POSIX only')
+class StartupProfileTests(SimpleTestCase):
+    def probe(self):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get(
+            'DJANGO_SETTINGS_MODULE', 'asset_management_system.settings'))
+        code = STARTUP_PROBE.format(urlconf=settings.ROOT_URLCONF, heavy=HEAVY_MODULES)
+        output = subprocess.run(
+            [sys.executable, '-c', code],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    def test_startup_within_budget(self):
+        # Best of three, to keep the check stable on a busy machine
+        results = [self.probe() for _ in range(3)]
+        self.assertEqual(results[0]['modules'], [], 'heavy modules imported at startup')
+        self.assertLess(min(r['seconds'] for r in results), STARTUP_TIME_BUDGET)
+        self.assertLess(min(r['rss_mib'] for r in results), STARTUP_RSS_BUDGET)
+
+
+class AssetTestMixin:
+    def setUp(self):
+        super().setUp()
+        self.department = Department.objects.create(name='Engineering')
+        self.user = User.objects.create_user('user', password='user')
+        self.admin = User.objects.create_user('admin', password='admin', is_staff=True)
+
+    def make_asset(self, name='Chair', **kwargs):
+        kwargs.setdefault('category', 'furniture')
+        kwargs.setdefault('department', self.department)
+        return Asset.objects.create(name=name, **kwargs)
+
+
+class RetentionTests(AssetTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir)
+        self.now = timezone.now()
+        asset = self.make_asset()
+        # 7 old processed, 2 recent processed, 1 pending
+        for days in [100] * 7 + [10] * 2:
+            AssetRequest.objects.create(
+                asset=asset, user=self.user, approved=True,
+                approval_date=self.now - timedelta(days=days),
+            )
+        AssetRequest.objects.create(asset=asset, user=self.admin)
+
+    def archived_rows(self, archive_file):
+        with gzip.open(archive_file, 'rt', encoding='utf-8') as archive:
+            return [json.loads(line) for line in archive]
+
+    def test_purges_only_rows_before_cutoff(self):
+        deleted, archive_file = purge_processed_requests(
+            days=90, chunk_size=3, archive_dir=self.archive_dir, now=self.now,
+        )
+        self.assertEqual(deleted, 7)
+        self.assertEqual(AssetRequest.objects.filter(approved=True).count(), 2)
+        self.assertEqual(AssetRequest.objects.filter(approved__isnull=True).count(), 1)
+        self.assertEqual(len(self.archived_rows(archive_file)), 7)
+
+    def test_chunks_cover_every_row_once(self):
+        # 7 old rows in chunks of 3 end on a partial chunk; the 2 remaining
+        # rows in chunks of 2 end exactly on a chunk boundary
+        for chunk_size, days, expected in [(3, 90, 7), (2, 0, 2)]:
+            deleted, archive_file = purge_processed_requests(
+                days=days, chunk_size=chunk_size, archive_dir=self.archive_dir, now=self.now,
+            )
+            self.assertEqual(deleted, expected)
+            ids = [row['id'] for row in self.archived_rows(archive_file)]
+            self.assertEqual(len(ids), len(set(ids)))
+            os.remove(archive_file)
+
+    def test_max_chunks_stops_early(self):
+        deleted, _ = purge_processed_requests(
+            days=0, chunk_size=4, max_chunks=1, archive=False, now=self.now,
+        )
+        self.assertEqual(deleted, 4)
+        self.assertEqual(AssetRequest.objects.filter(approved=True).count(), 5)
+
+    def test_archive_contents(self):
+        purge_processed_requests(days=90, archive_dir=self.archive_dir, now=self.now)
+        archive_file = next(os.scandir(self.archive_dir)).path
+        row = self.archived_rows(archive_file)[0]
+        self.assertEqual(row['asset__name'], 'Chair')
+        self.assertEqual(row['user__username'], 'user')
+        self.assertIs(row['approved'], True)
+        self.assertIn('approval_date', row)
+
+    def test_clear_history_view_deletes_one_chunk_and_queues_the_rest(self):
+        self.client.force_login(self.admin)
+        with self.settings(ASSET_RETENTION={'CHUNK_SIZE': 4, 'ARCHIVE_DIR': self.archive_dir}):
+            self.client.post(reverse('clear_request_history'))
+            self.assertEqual(AssetRequest.objects.filter(approved=True).count(), 5)
+            purge = HistoryPurge.objects.get()
+            self.assertIsNone(purge.completed_at)
+
+            self.assertEqual(run_queued_purges(), 5)
+        self.assertFalse(AssetRequest.objects.filter(approved=True).exists())
+        self.assertTrue(AssetRequest.objects.filter(approved__isnull=True).exists())
+        purge.refresh_from_db()
+        self.assertIsNotNone(purge.completed_at)
+
+    def test_scheduler_tick_runs_queued_purges(self):
+        HistoryPurge.objects.create(cutoff=self.now, requested_by=self.admin)
+        with self.settings(ASSET_RETENTION={'ARCHIVE_DIR': self.archive_dir}):
+            self.assertEqual(tick(self.now), (0, 0, 9))
+        self.assertFalse(HistoryPurge.objects.filter(completed_at__isnull=True).exists())
+
+
+class PendingRequestStateTests(AssetTestMixin, TestCase):
+    def request_asset(self, asset):
+        return self.client.post(
+            reverse('request_asset', args=[asset.pk]), {'purpose': 'Need it'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+
+    def test_duplicate_pending_request_is_rejected(self):
+        asset = self.make_asset()
+        self.client.force_login(self.user)
+        self.assertEqual(self.request_asset(asset).status_code, 200)
+        self.assertEqual(self.request_asset(asset).status_code, 409)
+        asset.refresh_from_db()
+        self.assertEqual(asset.pending_request_count, 1)
+
+    def test_processing_twice_decrements_once(self):
+        asset = self.make_asset()
+        other = User.objects.create_user('other')
+        AssetRequest.objects.create(asset=asset, user=other)
+        asset_request = AssetRequest.objects.create(asset=asset, user=self.user)
+        Asset.objects.filter(pk=asset.pk).update(pending_request_count=2)
+
+        self.client.force_login(self.admin)
+        url = reverse('process_request', args=[asset_request.pk, 'approve'])
+        self.client.get(url)
+        self.client.get(url)
+
+        asset.refresh_from_db()
+        self.assertEqual(asset.pending_request_count, 1)
+        self.assertEqual((asset.status, asset.assigned_to), ('in_use', self.user))
+        asset_request.refresh_from_db()
+        self.assertIs(asset_request.approved, True)
+
+    def pending_count(self, asset):
+        asset.refresh_from_db()
+        return asset.pending_request_count
+
+    def test_deleting_pending_requests_outside_the_views_recounts(self):
+        asset = self.make_asset()
+        self.client.force_login(self.user)
+        self.request_asset(asset)
+        other = User.objects.create_user('other')
+        AssetRequest.objects.create(asset=asset, user=other)
+        AssetRequest.objects.create(asset=asset, user=other, approved=False)
+        Asset.objects.filter(pk=asset.pk).update(pending_request_count=2)
+
+        other.delete()
+        self.assertEqual(self.pending_count(asset), 1)
+        AssetRequest.objects.get(user=self.user).delete()
+        self.assertEqual(self.pending_count(asset), 0)
+
+    def test_admin_edit_recounts(self):
+        asset = self.make_asset()
+        asset_request = AssetRequest.objects.create(asset=asset, user=self.user)
+        Asset.objects.filter(pk=asset.pk).update(pending_request_count=1)
+        admin_user = User.objects.create_superuser('root', password='root')
+        self.client.force_login(admin_user)
+        self.client.post(reverse('admin:assets_assetrequest_change', args=[asset_request.pk]), {
+            'asset': asset.pk, 'user': self.user.pk, 'purpose': '', 'approved': 'false',
+        })
+        asset_request.refresh_from_db()
+        self.assertIs(asset_request.approved, False)
+        self.assertEqual(self.pending_count(asset), 0)
+
+    def test_recount_command_repairs_counts(self):
+        asset = self.make_asset()
+        AssetRequest.objects.create(asset=asset, user=self.user)
+        idle = self.make_asset('Desk')
+        Asset.objects.update(pending_request_count=7)
+        call_command('recount_pending_requests', stdout=StringIO())
+        self.assertEqual((self.pending_count(asset), self.pending_count(idle)), (1, 0))
+
+class RateLimitTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_window_is_shared_between_workers(self):
+        # Two limiters on one key stand in for two workers on a shared cache
+        first, second = SlidingWindow('k', 2, 60), SlidingWindow('k', 2, 60)
+        self.assertEqual(first.consume(now=120), 0)
+        self.assertEqual(second.consume(now=120), 0)
+        self.assertEqual(first.consume(now=130), 50)
+        # Halfway into the next window half of the previous one still counts
+        self.assertEqual(second.consume(now=210), 0)
+        self.assertEqual(first.consume(now=210), 30)
+
+    def test_local_fallback_expires_and_is_capped(self):
+        broken = mock.Mock(**{f'{name}.side_effect': ConnectionError for name in ['get', 'set', 'add', 'incr']})
+        self.addCleanup(throttling._local_store.clear)
+        with mock.patch.object(throttling, 'cache', broken), \
+                mock.patch.object(throttling, 'LOCAL_STORE_MAX_ENTRIES', 3):
+            self.assertTrue(throttling._cache_add('expired', 'x', -1))
+            self.assertIsNone(throttling._cache_get('expired'))
+            for index in range(5):
+                throttling._cache_set(f'key-{index}', index, 60)
+            self.assertEqual(len(throttling._local_store), 3)
+            self.assertEqual(throttling._cache_get('key-4'), 4)
+            self.assertIsNone(throttling._cache_get('key-0'))
+
+
+class IdempotencyTests(AssetTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.asset = self.make_asset()
+        self.client.force_login(self.user)
+
+    def request_asset(self, asset=None, key='key-1', purpose='Need it'):
+        return self.client.post(
+            reverse('request_asset', args=[(asset or self.asset).pk]),
+            {'purpose': purpose, 'idempotency_key': key},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+
+    def test_retry_replays_the_first_response(self):
+        first = self.request_asset()
+        second = self.request_asset()
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(AssetRequest.objects.count(), 1)
+
+    def test_key_is_scoped_to_the_path(self):
+        self.request_asset()
+        self.assertEqual(self.request_asset(self.make_asset('Desk')).status_code, 200)
+        self.assertEqual(AssetRequest.objects.count(), 2)
+
+    def test_reused_key_with_a_different_payload_is_rejected(self):
+        self.request_asset()
+        self.assertEqual(self.request_asset(purpose='Something else').status_code, 422)
+        self.assertEqual(AssetRequest.objects.count(), 1)
+
+    def test_in_flight_request_conflicts(self):
+        path = reverse('request_asset', args=[self.asset.pk])
+        request = RequestFactory().post(path, {'purpose': 'Need it', 'idempotency_key': 'key-1'})
+        claim_idempotency_key(self.user, path, 'key-1', request_fingerprint(request))
+        self.assertEqual(self.request_asset().status_code, 409)
+        self.assertFalse(AssetRequest.objects.exists())
+
+    def test_key_is_released_when_the_view_fails(self):
+        with mock.patch('assets.views.AssetRequestForm.save', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.request_asset()
+        self.assertEqual(self.request_asset().status_code, 200)
+        self.assertEqual(AssetRequest.objects.count(), 1)
+
+    def test_rate_limit_sets_retry_after(self):
+        with self.settings(ASSET_RATE_LIMITS={'request_asset': (1, 60)}):
+            self.assertEqual(self.request_asset(key='key-1').status_code, 200)
+            desk = self.make_asset('Desk')
+            response = self.request_asset(desk, key='key-2')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        # A throttled attempt does not burn its key
+        path = reverse('request_asset', args=[desk.pk])
+        self.assertIsNone(get_idempotent_result(self.user, path, 'key-2'))
+
+
+class UserSearchTests(AssetTestMixin, TestCase):
+    def test_lower_indexes_exist(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, User._meta.db_table)
+        for column in ['username', 'first_name', 'last_name']:
+            self.assertIn(f'assets_user_lower_{column}_idx', constraints)
+
+    def test_prefix_and_full_name_search(self):
+        User.objects.create_user('jdoe', first_name='Jane', last_name='Doe')
+        self.client.force_login(self.admin)
+        for term in ['JD', 'jane', 'jane d']:
+            response = self.client.get(reverse('user_search'), {'q': term})
+            self.assertEqual([u['username'] for u in response.json()['results']], ['jdoe'], term)
+
+    def test_invalid_assignee_is_a_form_error(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('asset_create'), {
+            'name': 'Chair', 'category': 'furniture', 'status': 'available',
+            'department': self.department.pk, 'assigned_to': 'abc',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('assigned_to', response.context['form'].errors)
+        self.assertEqual(response.context['form']['assigned_to'].value(), 'abc')
+
+
+class BulkActionTests(AssetTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.ops = Department.objects.create(name='Ops')
+        # Five in-use assets match the filter, the other two do not
+        self.matching = [self.make_asset(f'Chair {i}', status='in_use') for i in range(5)]
+        self.others = [
+            self.make_asset('Spare chair'),
+            self.make_asset('Ops chair', status='in_use', department=self.ops),
+        ]
+        self.client.force_login(self.admin)
+
+    def bulk(self, action, **fields):
+        data = {'bulk-action': action, 'bulk-select_all': 'on', 'status': 'in_use',
+                'department': self.department.pk}
+        data.update({f'bulk-{name}': value for name, value in fields.items()})
+        return self.client.post(reverse('asset_bulk_action'), data)
+
+    def assert_others_untouched(self):
+        for asset in self.others:
+            before = (asset.status, asset.department_id, asset.assigned_to_id)
+            asset.refresh_from_db()
+            self.assertEqual((asset.status, asset.department_id, asset.assigned_to_id), before)
+
+    def matching_values(self, field):
+        return set(Asset.objects.filter(pk__in=[a.pk for a in self.matching]).values_list(field, flat=True))
+
+    def test_status(self):
+        self.bulk('status', status='maintenance')
+        self.assertEqual(self.matching_values('status'), {'maintenance'})
+        self.assert_others_untouched()
+
+    def test_department(self):
+        self.bulk('department', department=self.ops.pk)
+        self.assertEqual(self.matching_values('department'), {self.ops.pk})
+        self.assert_others_untouched()
+
+    def test_assign(self):
+        self.bulk('assign', assigned_to=self.user.pk)
+        self.assertEqual(self.matching_values('assigned_to'), {self.user.pk})
+        self.assert_others_untouched()
+
+    def test_delete_pages_through_the_selection(self):
+        with mock.patch('assets.views.BULK_DELETE_CHUNK_SIZE', 2):
+            response = self.bulk('delete')
+        self.assertFalse(Asset.objects.filter(pk__in=[a.pk for a in self.matching]).exists())
+        self.assertEqual(Asset.objects.count(), len(self.others))
+        self.assertIn('5 assets deleted', [str(m) for m in get_messages(response.wsgi_request)][0])
+
+
+class DepartmentHierarchyTests(AssetTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.backend = Department.objects.create(name='Backend', parent=self.department)
+        self.database = Department.objects.create(name='Database', parent=self.backend)
+        self.ops = Department.objects.create(name='Ops')
+
+    def links(self):
+        return set(DepartmentClosure.objects.values_list('ancestor__name', 'descendant__name', 'depth'))
+
+    def subtree_names(self, department):
+        return set(department.subtree().values_list('name', flat=True))
+
+    def test_create_links_every_ancestor(self):
+        self.assertEqual(self.subtree_names(self.department), {'Engineering', 'Backend', 'Database'})
+        self.assertEqual(DepartmentClosure.objects.get(ancestor=self.department, descendant=self.database).depth, 2)
+
+    def test_move_rehangs_the_subtree(self):
+        self.backend.parent = self.ops
+        self.backend.save()
+        self.assertEqual(self.subtree_names(self.department), {'Engineering'})
+        self.assertEqual(self.subtree_names(self.ops), {'Ops', 'Backend', 'Database'})
+        self.assertEqual(DepartmentClosure.objects.get(ancestor=self.ops, descendant=self.database).depth, 2)
+
+        self.backend.parent = None
+        self.backend.save()
+        self.assertEqual(self.subtree_names(self.ops), {'Ops'})
+        self.assertFalse(DepartmentClosure.objects.filter(descendant=self.database, depth__gt=1).exists())
+
+    def test_rebuild_matches_incremental_maintenance(self):
+        self.backend.parent = self.ops
+        self.backend.save()
+        expected = self.links()
+        DepartmentClosure.objects.all().delete()
+        DepartmentClosure.rebuild()
+        self.assertEqual(self.links(), expected)
+
+    def test_save_rejects_cycles(self):
+        self.department.parent = self.database
+        with self.assertRaises(ValidationError):
+            self.department.save()
+        self.department.refresh_from_db()
+        self.assertIsNone(self.department.parent)
+
+    def test_delete_with_children_is_protected(self):
+        asset = self.make_asset(department=self.database)
+        with self.assertRaises(ProtectedError):
+            self.department.delete()
+        # A leaf department still takes its assets with it, as before
+        self.database.delete()
+        self.assertFalse(Asset.objects.filter(pk=asset.pk).exists())
+        self.assertEqual(self.subtree_names(self.department), {'Engineering', 'Backend'})
+
+    def test_asset_list_filters_by_subtree(self):
+        self.make_asset('In database', department=self.database)
+        self.make_asset('In ops', department=self.ops)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('asset_list'), {'department': self.department.pk})
+        self.assertEqual([a.name for a in response.context['assets']], ['In database'])
+
+
+class ReportTests(AssetTestMixin, TestCase):
+    def test_report_has_a_section_per_department_part(self):
+        # Imported here, like the view does, to keep them out of startup
+        from pypdf import PdfReader
+
+        from .reporting import build_report
+
+        for index in range(5):
+            self.make_asset(f'Chair {index}')
+        output = BytesIO()
+        with self.settings(ASSET_REPORTS={'WORKERS': 1, 'ROWS_PER_PART': 2}):
+            build_report(output)
+        # Summary, three Engineering parts and one page per empty department
+        empty = Department.objects.exclude(pk=self.department.pk).count()
+        pages = PdfReader(output, strict=True).pages
+        self.assertEqual(len(pages), 1 + 3 + empty)
+        self.assertIn('Asset Management Report', pages[0].extract_text())
+        self.assertIn('Chair 4', pages[3].extract_text())
+
+
+class SchedulerTests(AssetTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+
+    def schedule(self, asset, interval=timedelta(days=30), due_in=timedelta(days=-1), **kwargs):
+        return MaintenanceSchedule.objects.create(
+            asset=asset, interval=interval, next_due=self.now + due_in, **kwargs
+        )
+
+    def test_zero_interval_is_rejected(self):
+        schedule = MaintenanceSchedule(asset=self.make_asset(), interval=timedelta(0), next_due=self.now)
+        with self.assertRaises(ValidationError):
+            schedule.full_clean()
+        with self.assertRaises(IntegrityError):
+            schedule.save()
+
+    def test_counts_only_assets_moved(self):
+        self.schedule(self.make_asset('Available'))
+        self.schedule(self.make_asset('Retired', status='retired'))
+        self.assertEqual(run_due_maintenance(self.now), 1)
+        self.assertEqual(
+            dict(Asset.objects.values_list('name', 'status')),
+            {'Available': 'maintenance', 'Retired': 'retired'},
+        )
+        # Both schedules advance, so neither is due again
+        self.assertFalse(MaintenanceSchedule.objects.filter(next_due__lte=self.now).exists())
+
+    def test_batches_cover_every_due_schedule(self):
+        for index in range(5):
+            self.schedule(self.make_asset(f'Chair {index}'))
+        self.schedule(self.make_asset('Not due'), due_in=timedelta(days=1))
+        self.assertEqual(run_due_maintenance(self.now, batch_size=2), 5)
+        self.assertEqual(Asset.objects.filter(status='maintenance').count(), 5)
+        self.assertEqual(Asset.objects.get(name='Not due').status, 'available')
+        self.assertEqual(
+            MaintenanceSchedule.objects.filter(last_triggered=self.now).count(), 5
+        )
+
+    def test_tick_retires_and_drops_the_schedule(self):
+        retiring = self.schedule(self.make_asset('Old'), retire_on=self.now - timedelta(hours=1))
+        self.schedule(self.make_asset('New'), retire_on=self.now + timedelta(days=1))
+        self.assertEqual(tick(self.now), (1, 1, 0))
+        self.assertEqual(
+            dict(Asset.objects.values_list('name', 'status')),
+            {'Old': 'retired', 'New': 'maintenance'},
+        )
+        self.assertFalse(MaintenanceSchedule.objects.filter(pk=retiring.pk).exists())
+
+    def test_tick_is_skipped_while_another_worker_holds_the_lock(self):
+        self.schedule(self.make_asset())
+        cache.add(TICK_LOCK_KEY, 'other-worker')
+        self.addCleanup(cache.delete, TICK_LOCK_KEY)
+        self.assertEqual(tick(self.now), (0, 0, 0))
+        self.assertEqual(Asset.objects.get().status, 'available')
+        self.assertEqual(cache.get(TICK_LOCK_KEY), 'other-worker')
+
+
+class MediaTests(AssetTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = self.settings(MEDIA_ROOT=self.media_root, MEDIA_SENDFILE_HEADER=None)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def write(self, name, content=b'image bytes'):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return name
+
+    def test_conditional_requests(self):
+        url = reverse('serve_media', args=[self.write('assets/photo.png')])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'image bytes')
+
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        for headers in [{'If-None-Match': etag}, {'If-Modified-Since': last_modified}]:
+            not_modified = self.client.get(url, headers=headers)
+            self.assertEqual(not_modified.status_code, 304, headers)
+            self.assertEqual(not_modified['ETag'], etag)
+            self.assertEqual(not_modified['Cache-Control'], 'public, max-age=3600')
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': '"stale"'}).status_code, 200)
+        self.assertEqual(self.client.get(url, headers={'If-Match': '"stale"'}).status_code, 412)
+
+    def image_asset(self, name, content):
+        asset = self.make_asset(name)
+        asset.image.save('Photo.PNG', ContentFile(content))
+        return asset
+
+    def test_identical_uploads_are_stored_once(self):
+        first = self.image_asset('Chair', b'same bytes')
+        second = self.image_asset('Desk', b'same bytes')
+        digest = hashlib.sha256(b'same bytes').hexdigest()
+        self.assertEqual(first.image.name, f'assets/{digest[:2]}/{digest[2:4]}/{digest}.png')
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertNotEqual(self.image_asset('Lamp', b'other bytes').image.name, first.image.name)
+        shard = os.path.join(self.media_root, 'assets', digest[:2], digest[2:4])
+        self.assertEqual(os.listdir(shard), [f'{digest}.png'])
+
+    def test_cleanup_removes_only_unreferenced_images(self):
+        kept = self.image_asset('Chair', b'kept')
+        orphan = self.image_asset('Desk', b'orphan')
+        orphan_path = orphan.image.path
+        orphan.delete()
+        self.image_asset('Lamp', b'fresh orphan').delete()
+
+        call_command('cleanup_asset_images', '--dry-run', stdout=StringIO())
+        self.assertTrue(os.path.exists(orphan_path))
+
+        # Back-date everything except the fresh orphan past --min-age
+        old = time.time() - 7200
+        for path in [kept.image.path, orphan_path]:
+            os.utime(path, (old, old))
+        out = StringIO()
+        call_command('cleanup_asset_images', stdout=out)
+        self.assertIn('Deleted 1 ', out.getvalue())
+        self.assertTrue(os.path.exists(kept.image.path))
+        self.assertFalse(os.path.exists(os.path.dirname(os.path.dirname(orphan_path))))
+        remaining = [name for name, _ in kept.image.storage.hashed_files('assets')]
+        self.assertEqual(len(remaining), 2)
+
+    def test_reupload_of_an_orphan_protects_it_from_cleanup(self):
+        orphan = self.image_asset('Desk', b'reused')
+        path = orphan.image.path
+        orphan.delete()
+        old = time.time() - 7200
+        os.utime(path, (old, old))
+        # Same bytes uploaded again after cleanup took its snapshot of
+        # referenced names, which therefore does not include it
+        reused = self.image_asset('Lamp', b'reused')
+        self.assertEqual(reused.image.path, path)
+        with mock.patch('assets.management.commands.cleanup_asset_images.Asset.objects') as objects:
+            objects.exclude.return_value.exclude.return_value.values_list.return_value = []
+            call_command('cleanup_asset_images', stdout=StringIO())
+        self.assertTrue(os.path.exists(path))
@@ -0,0 +1,194 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# (calls allowed, per this many seconds) per endpoint scope
+DEFAULT_RATE_LIMITS = {
+    'request_asset': (5, 60),
+}
+
+IDEMPOTENCY_TTL = 24 * 60 * 60
+
+# Form fields that differ between renders of the same form
+IDEMPOTENCY_IGNORED_FIELDS = {'csrfmiddlewaretoken', 'idempotency_key'}
+
+# Process-local fallback used while the cache backend is unavailable:
+# key -> (value, expiry as time.monotonic(), or None for no expiry)
+LOCAL_STORE_MAX_ENTRIES = 10000
+
+_local_lock = threading.RLock()
+_local_store = {}
+
+
+def get_rate_limits():
+    limits = dict(DEFAULT_RATE_LIMITS)
+    limits.update(getattr(settings, 'ASSET_RATE_LIMITS', {}))
+    return limits
+
+
+def _local_get(key):
+    # Callers hold _local_lock
+    value, expires = _local_store.get(key, (None, None))
+    if expires is not None and expires <= time.monotonic():
+        del _local_store[key]
+        return None
+    return value
+
+
+def _local_set(key, value, timeout):
+    # Callers hold _local_lock
+    now = time.monotonic()
+    if key not in _local_store and len(_local_store) >= LOCAL_STORE_MAX_ENTRIES:
+        for stale in [k for k, (_, expires) in _local_store.items() if expires is not None and expires <= now]:
+            del _local_store[stale]
+        while len(_local_store) >= LOCAL_STORE_MAX_ENTRIES:
+            # Evict the oldest entry
+            del _local_store[next(iter(_local_store))]
+    _local_store[key] = (value, None if timeout is None else now + timeout)
+
+
+def _cache_get(key):
+    try:
+        return cache.get(key)
+    except Exception:
+        # Cache backend unavailable, fall back to process memory
+        with _local_lock:
+            return _local_get(key)
+
+
+def _cache_set(key, value, timeout):
+    try:
+        cache.set(key, value, timeout)
+    except Exception:
+        with _local_lock:
+            _local_set(key, value, timeout)
+
+
+def _cache_incr(key, delta=1, timeout=None):
+    """Atomically add delta to a counter, creating it if needed"""
+    try:
+        cache.add(key, 0, timeout)
+        try:
+            return cache.incr(key, delta)
+        except ValueError:
+            # Expired between add() and incr()
+            cache.add(key, 0, timeout)
+            return cache.incr(key, delta)
+    except Exception:
+        with _local_lock:
+            value = (_local_get(key) or 0) + delta
+            _local_set(key, value, timeout)
+            return value
+
+
+def _cache_add(key, value, timeout):
+    try:
+        return cache.add(key, value, timeout)
+    except Exception:
+        with _local_lock:
+            if _local_get(key) is not None:
+                return False
+            _local_set(key, value, timeout)
+            return True
+
+
+class SlidingWindow:
+    """Allow up to `capacity` calls per `period` seconds.
+
+    Calls are counted per fixed window with the cache's atomic add/incr, so
+    concurrent workers sharing the cache cannot both take the last slot.
+    The previous window's count is weighted by how much of it still
+    overlaps the sliding period, which avoids a double burst at window
+    boundaries.
+    """
+
+    def __init__(self, key, capacity, period):
+        self.key = f'throttle:{key}'
+        self.capacity = capacity
+        self.period = period
+
+    def consume(self, now=None):
+        """Take one slot. Returns 0 on success, otherwise the seconds to wait."""
+        now = now if now is not None else time.time()
+        window, elapsed = divmod(now, self.period)
+        window = int(window)
+        current_key = f'{self.key}:{window}'
+        # Kept for two periods so the next window can still weigh it
+        current = _cache_incr(current_key, timeout=self.period * 2)
+        previous = _cache_get(f'{self.key}:{window - 1}') or 0
+        overlap = 1 - elapsed / self.period
+        if previous * overlap + current <= self.capacity:
+            return 0
+
+        # Rejected calls do not use up the window
+        _cache_incr(current_key, -1, timeout=self.period * 2)
+        if current > self.capacity or not previous:
+            return self.period - elapsed
+        # Wait until enough of the previous window has slid out
+        needed_overlap = (self.capacity - current) / previous
+        return (overlap - needed_overlap) * self.period
+
+
+def check_rate_limit(scope, user):
+    """Take a slot for `user` on `scope`; returns seconds to wait or 0"""
+    capacity, period = get_rate_limits()[scope]
+    wait = SlidingWindow(f'{scope}:{user.pk}', capacity, period).consume()
+    if wait:
+        _cache_incr(f'throttle:count:{scope}')
+    return wait
+
+
+def throttle_counts():
+    """Number of throttled calls per scope"""
+    return {
+        scope: _cache_get(f'throttle:count:{scope}') or 0
+        for scope in get_rate_limits()
+    }
+
+
+def _idempotency_cache_key(user, path, key):
+    # Scoped to the endpoint, and hashed so long paths or keys stay within
+    # the cache backend's key length limit
+    digest = hashlib.sha256(f'{path}\0{key}'.encode()).hexdigest()
+    return f'idempotency:{user.pk}:{digest}'
+
+
+def request_fingerprint(request):
+    """Hash of the submitted form data, ignoring per-render tokens"""
+    digest = hashlib.sha256()
+    for name in sorted(request.POST):
+        if name in IDEMPOTENCY_IGNORED_FIELDS:
+            continue
+        for value in request.POST.getlist(name):
+            digest.update(f'{name}\0{value}\0'.encode())
+    for name in sorted(request.FILES):
+        for upload in request.FILES.getlist(name):
+            digest.update(f'{name}\0{upload.name}\0{upload.size}\0'.encode())
+    return digest.hexdigest()
+
+
+def get_idempotent_result(user, path, key):
+    """(fingerprint, result) stored for `key`, result being 'pending' while
+    the first request is in flight, or None"""
+    return _cache_get(_idempotency_cache_key(user, path, key))
+
+
+def claim_idempotency_key(user, path, key, fingerprint):
+    """Reserve `key` for an in-flight request. False if it is already taken."""
+    return _cache_add(_idempotency_cache_key(user, path, key), (fingerprint, 'pending'), IDEMPOTENCY_TTL)
+
+
+def store_idempotent_result(user, path, key, fingerprint, result):
+    _cache_set(_idempotency_cache_key(user, path, key), (fingerprint, result), IDEMPOTENCY_TTL)
+
+
+def release_idempotency_key(user, path, key):
+    cache_key = _idempotency_cache_key(user, path, key)
+    try:
+        cache.delete(cache_key)
+    except Exception:
+        with _local_lock:
+            _local_store.pop(cache_key, None)
@@ -2,32 +2,39 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
-from .models import Asset, AssetRequest
-from .forms import AssetForm, AssetRequestForm
-from .decorators import admin_required
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from .models import Asset, AssetRequest, Department, DepartmentClosure, HistoryPurge
+from .forms import AssetForm, AssetRequestForm, BulkAssetActionForm
+from .decorators import admin_required, idempotent, rate_limit
+from .retention import processed_requests_before, purge_processed_requests
+from .signals import assets_bulk_changed
+from .storage import is_content_addressed
+from .throttling import throttle_counts
 from django.contrib.auth import login
 from django.contrib.auth.models import User
 from django.conf import settings
-from django.db.models import Q
-from django.http import JsonResponse
-from django.http import HttpResponse
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Lower
+from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, Http404
 from django.db.models import Count
-from io import BytesIO
 from datetime import datetime
+import mimetypes
+import os
+import tempfile
+import uuid
 
-@login_required
-def asset_list(request):
-    """View to list all assets"""
-    query = request.GET.get('q', '')
-    category_filter = request.GET.get('category', '')
-    status_filter = request.GET.get('status', '')
-    
-    assets = Asset.objects.all()
+def filter_assets(assets, params):
+    """Apply the asset_list search and filter parameters to a queryset"""
+    query = params.get('q', '')
+    category_filter = params.get('category', '')
+    status_filter = params.get('status', '')
+    department_filter = params.get('department', '')
     
     # Apply search query
     if query:
@@ -47,6 +54,25 @@ def asset_list(request):
     if status_filter:
         assets = assets.filter(status=status_filter)
     
+    # Apply department filter, including every sub-department
+    if department_filter.isdigit():
+        assets = assets.filter(department__ancestor_links__ancestor_id=department_filter)
+    
+    return assets
+
+@login_required
+def asset_list(request):
+    """View to list all assets"""
+    query = request.GET.get('q', '')
+    category_filter = request.GET.get('category', '')
+    status_filter = request.GET.get('status', '')
+    department_filter = request.GET.get('department', '')
+    
+    assets = filter_assets(
+        Asset.objects.select_related('department', 'assigned_to').with_request_state(request.user),
+        request.GET,
+    )
+    
     # Get unique categories and statuses for filters
     categories = Asset.CATEGORY_CHOICES
     statuses = Asset.STATUS_CHOICES
@@ -58,17 +84,20 @@ def asset_list(request):
         'statuses': statuses,
         'selected_category': category_filter,
         'selected_status': status_filter,
+        'departments': Department.objects.order_by('name'),
+        'selected_department': department_filter,
+        'bulk_form': BulkAssetActionForm(prefix='bulk'),
     })
 
 @login_required
 def asset_detail(request, pk):
     """View to show details of a specific asset"""
-    asset = get_object_or_404(Asset, pk=pk)
-    can_request = not AssetRequest.objects.filter(
-        asset=asset,
-        user=request.user,
-        approved__isnull=True
-    ).exists()
+    asset = get_object_or_404(
+        Asset.objects.select_related('department', 'assigned_to', 'maintenance_schedule')
+        .with_request_state(request.user),
+        pk=pk,
+    )
+    can_request = not asset.user_has_pending_request
     return render(request, 'assets/asset_detail.html', {
         'asset': asset,
         'can_request': can_request
@@ -103,6 +132,46 @@ def asset_update(request, pk):
         form = AssetForm(instance=asset)
     return render(request, 'assets/asset_form.html', {'form': form, 'action': 'Update'})
 
+USER_SEARCH_LIMIT = 20
+
+@login_required
+@admin_required
+def user_search(request):
+    """Prefix search over username and first/last name for the assignment picker"""
+    term = request.GET.get('q', '').strip().lower()
+    if not term:
+        return JsonResponse({'results': []})
+
+    def prefix(field, value):
+        # A range on LOWER(field) can use the expression indexes from
+        # migration 0006, unlike icontains or istartswith
+        return Q(**{f'{field}__gte': value, f'{field}__lt': value + '\uffff'})
+
+    first, _, rest = term.partition(' ')
+    if rest:
+        match = prefix('lower_first_name', first) & prefix('lower_last_name', rest)
+    else:
+        match = prefix('lower_username', term) | prefix('lower_first_name', term) | prefix('lower_last_name', term)
+
+    users = (
+        User.objects.annotate(
+            lower_username=Lower('username'),
+            lower_first_name=Lower('first_name'),
+            lower_last_name=Lower('last_name'),
+        )
+        .filter(match)
+        .order_by('username')
+        .values('id', 'username', 'first_name', 'last_name')[:USER_SEARCH_LIMIT]
+    )
+    return JsonResponse({'results': [
+        {
+            'id': user['id'],
+            'label': f"{user['first_name']} {user['last_name']}".strip() or user['username'],
+            'username': user['username'],
+        }
+        for user in users
+    ]})
+
 @login_required
 @admin_required
 def asset_delete(request, pk):
@@ -114,7 +183,61 @@ def asset_delete(request, pk):
         return redirect('asset_list')
     return render(request, 'assets/asset_confirm_delete.html', {'asset': asset})
 
+BULK_DELETE_CHUNK_SIZE = 500
+
 @login_required
+@admin_required
+def asset_bulk_action(request):
+    """Apply a status, department or assignee change, or a delete, to many assets"""
+    if request.method != 'POST':
+        return redirect('asset_list')
+
+    form = BulkAssetActionForm(request.POST, prefix='bulk')
+    if not form.is_valid():
+        for errors in form.errors.values():
+            for error in errors:
+                messages.error(request, error)
+        return redirect(request.META.get('HTTP_REFERER', 'asset_list'))
+
+    action = form.cleaned_data['action']
+    if form.cleaned_data['select_all']:
+        # The whole filter result, with filters carried over from asset_list
+        assets = filter_assets(Asset.objects.all(), request.POST)
+    else:
+        assets = Asset.objects.filter(pk__in=form.cleaned_data['asset_ids'])
+
+    if action == 'delete':
+        # Paged by primary key with one transaction per chunk, so a huge
+        # selection never holds every key or one long write lock
+        count = 0
+        last_pk = 0
+        while True:
+            pks = list(
+                assets.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:BULK_DELETE_CHUNK_SIZE]
+            )
+            if not pks:
+                break
+            with transaction.atomic():
+                _, deleted = Asset.objects.filter(pk__in=pks).delete()
+            count += deleted.get(Asset._meta.label, 0)
+            last_pk = pks[-1]
+        changes = {}
+    else:
+        changes = form.get_changes()
+        # update() skips auto_now, so stamp updated_at explicitly
+        count = assets.update(updated_at=timezone.now(), **changes)
+
+    assets_bulk_changed.send(sender=Asset, action=action, changes=changes, count=count)
+
+    if action == 'delete':
+        messages.success(request, f'{count} asset{"s" if count != 1 else ""} deleted successfully!')
+    else:
+        messages.success(request, f'{count} asset{"s" if count != 1 else ""} updated successfully!')
+    return redirect(request.META.get('HTTP_REFERER', 'asset_list'))
+
+@login_required
+@idempotent
+@rate_limit('request_asset')
 def request_asset(request, pk):
     """View to request an asset"""
     asset = get_object_or_404(Asset, pk=pk)
@@ -125,7 +248,19 @@ def request_asset(request, pk):
             asset_request = form.save(commit=False)
             asset_request.asset = asset
             asset_request.user = request.user
-            asset_request.save()
+            try:
+                with transaction.atomic():
+                    asset_request.save()
+                    Asset.objects.filter(pk=asset.pk).update(
+                        pending_request_count=F('pending_request_count') + 1
+                    )
+            except IntegrityError:
+                # unique_pending_request_per_user: one pending request per user and asset
+                error = 'You already have a pending request for this asset.'
+                if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                    return JsonResponse({'success': False, 'error': error}, status=409)
+                messages.error(request, error)
+                return redirect('asset_detail', pk=asset.pk)
             
             # Return JSON response for AJAX request
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
@@ -139,7 +274,8 @@ def request_asset(request, pk):
     
     return render(request, 'assets/request_asset.html', {
         'form': form,
-        'asset': asset
+        'asset': asset,
+        'idempotency_key': uuid.uuid4().hex,
     })
 
 @login_required
@@ -156,24 +292,39 @@ def manage_requests(request):
         'rejected_requests': rejected_requests
     })
 
+@login_required
+@admin_required
+def throttle_stats(request):
+    """JSON counters of throttled calls per rate-limited endpoint"""
+    return JsonResponse({'throttled': throttle_counts()})
+
 @login_required
 @admin_required
 def process_request(request, request_id, action):
     """View to approve or reject asset requests"""
     asset_request = get_object_or_404(AssetRequest, pk=request_id)
+    approved = action == 'approve'
+    now = timezone.now()
     
-    if action == 'approve':
-        asset_request.approved = True
-        asset_request.asset.assigned_to = asset_request.user
-        asset_request.asset.status = 'in_use'
-        asset_request.asset.save()
-        message = 'Request approved successfully!'
-    else:
-        asset_request.approved = False
-        message = 'Request rejected successfully!'
+    with transaction.atomic():
+        # Claim the row only while it is still pending, so two concurrent
+        # approve/reject calls cannot both decrement pending_request_count
+        claimed = AssetRequest.objects.filter(pk=asset_request.pk, approved__isnull=True).update(
+            approved=approved, approval_date=now
+        )
+        if claimed:
+            Asset.objects.filter(pk=asset_request.asset_id, pending_request_count__gt=0).update(
+                pending_request_count=F('pending_request_count') - 1
+            )
+        else:
+            # Re-deciding an already processed request
+            AssetRequest.objects.filter(pk=asset_request.pk).update(approved=approved, approval_date=now)
+        if approved:
+            Asset.objects.filter(pk=asset_request.asset_id).update(
+                assigned_to=asset_request.user_id, status='in_use', updated_at=now
+            )
     
-    asset_request.approval_date = timezone.now()
-    asset_request.save()
+    message = 'Request approved successfully!' if approved else 'Request rejected successfully!'
     messages.success(request, message)
     return redirect('manage_requests')
 
@@ -219,6 +370,12 @@ def reports(request):
     assets_by_category = Asset.objects.values('category').annotate(count=Count('category'))
     assets_by_status = Asset.objects.values('status').annotate(count=Count('status'))
     assets_by_department = Asset.objects.values('department__name').annotate(count=Count('department'))
+    # Rollup over the closure table: each department plus all of its sub-departments
+    assets_by_department_tree = (
+        DepartmentClosure.objects.values('ancestor__name')
+        .annotate(count=Count('descendant__asset'))
+        .order_by('ancestor__name')
+    )
     pending_requests = AssetRequest.objects.filter(approved__isnull=True).count()
     approved_requests = AssetRequest.objects.filter(approved=True).count()
     rejected_requests = AssetRequest.objects.filter(approved=False).count()
@@ -228,6 +385,7 @@ def reports(request):
         'assets_by_category': assets_by_category,
         'assets_by_status': assets_by_status,
         'assets_by_department': assets_by_department,
+        'assets_by_department_tree': assets_by_department_tree,
         'pending_requests': pending_requests,
         'approved_requests': approved_requests,
         'rejected_requests': rejected_requests,
@@ -237,167 +395,91 @@ def reports(request):
 @login_required
 def download_report(request):
     """Generate and download PDF report"""
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    
-    # Container for the 'Flowable' objects
-    elements = []
-    
-    # Define colors to match website theme
-    primary_color = colors.HexColor('#00c853')  # Your website's green
-    text_color = colors.HexColor('#2c3e50')
-    text_muted = colors.HexColor('#90a4ae')
-    border_color = colors.HexColor('#e0e0e0')
-    light_bg = colors.HexColor('#e8f5e9')  # Light green background
-    
-    # Define custom styles
-    styles = getSampleStyleSheet()
-    
-    # Title style
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=text_color,
-        spaceAfter=30,
-        alignment=1  # Center alignment
-    )
-    
-    # Heading style
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor=primary_color,
-        spaceBefore=20,
-        spaceAfter=15
-    )
-    
-    # Normal text style
-    normal_style = ParagraphStyle(
-        'CustomNormal',
-        parent=styles['Normal'],
-        textColor=text_color,
-        fontSize=10,
-        spaceBefore=10,
-        spaceAfter=10
+    # ReportLab is only needed here, so keep it out of every process that
+    # merely loads the URLconf (workers, management commands, tests)
+    from .reporting import build_report
+
+    # Spool to disk so large reports are not held in memory as one string
+    report = tempfile.TemporaryFile()
+    build_report(report)
+    report.seek(0)
+    return FileResponse(
+        report,
+        as_attachment=True,
+        filename=f"asset_report_{datetime.now().strftime('%Y%m%d')}.pdf",
+        content_type='application/pdf',
     )
-    
-    # Add logo and title
-    elements.append(Paragraph("GridSet", title_style))
-    elements.append(Paragraph("Asset Management Report", heading_style))
-    elements.append(Paragraph(f"Generated on: {datetime.now().strftime('%B %d, %Y')}", normal_style))
-    elements.append(Spacer(1, 20))
-    
-    # Asset Summary
-    elements.append(Paragraph("Asset Distribution", heading_style))
-    
-    # Assets by Category
-    categories = Asset.objects.values('category').annotate(count=Count('category'))
-    category_data = [['Category', 'Count']]
-    for cat in categories:
-        category_data.append([dict(Asset.CATEGORY_CHOICES)[cat['category']], cat['count']])
-    
-    category_table = Table(category_data, colWidths=[300, 100])
-    category_table.setStyle(TableStyle([
-        # Header style
-        ('BACKGROUND', (0, 0), (-1, 0), primary_color),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        # Data rows
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        ('TEXTCOLOR', (0, 1), (-1, -1), text_color),
-        ('ALIGN', (-1, 0), (-1, -1), 'CENTER'),  # Center align the count column
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 1, border_color),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, light_bg]),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-        ('TOPPADDING', (0, 1), (-1, -1), 8),
-    ]))
-    elements.append(category_table)
-    elements.append(Spacer(1, 20))
-    
-    # Assets by Status
-    elements.append(Paragraph("Status Distribution", heading_style))
-    status_data = [['Status', 'Count']]
-    statuses = Asset.objects.values('status').annotate(count=Count('status'))
-    for status in statuses:
-        status_data.append([dict(Asset.STATUS_CHOICES)[status['status']], status['count']])
-    
-    status_table = Table(status_data, colWidths=[300, 100])
-    status_table.setStyle(TableStyle([
-        # Header style
-        ('BACKGROUND', (0, 0), (-1, 0), primary_color),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        # Data rows
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        ('TEXTCOLOR', (0, 1), (-1, -1), text_color),
-        ('ALIGN', (-1, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 1, border_color),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, light_bg]),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-        ('TOPPADDING', (0, 1), (-1, -1), 8),
-    ]))
-    elements.append(status_table)
-    elements.append(Spacer(1, 20))
-    
-    # Department Distribution
-    elements.append(Paragraph("Department Distribution", heading_style))
-    dept_data = [['Department', 'Count']]
-    departments = Asset.objects.values('department__name').annotate(count=Count('department'))
-    for dept in departments:
-        dept_data.append([dept['department__name'], dept['count']])
-    
-    dept_table = Table(dept_data, colWidths=[300, 100])
-    dept_table.setStyle(TableStyle([
-        # Header style
-        ('BACKGROUND', (0, 0), (-1, 0), primary_color),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        # Data rows
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        ('TEXTCOLOR', (0, 1), (-1, -1), text_color),
-        ('ALIGN', (-1, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 1, border_color),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, light_bg]),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-        ('TOPPADDING', (0, 1), (-1, -1), 8),
-    ]))
-    elements.append(dept_table)
-    
-    # Build PDF
-    doc.build(elements)
-    
-    # Get the value of the BytesIO buffer and write it to the response
-    pdf = buffer.getvalue()
-    buffer.close()
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="asset_report_{datetime.now().strftime("%Y%m%d")}.pdf"'
-    response.write(pdf)
-    
-    return response
 
 @login_required
 @admin_required
 def clear_request_history(request):
     """View to clear processed request history"""
     if request.method == 'POST':
-        # Only clear processed requests (approved or rejected)
-        AssetRequest.objects.filter(approved__isnull=False).delete()
-        messages.success(request, 'Request history cleared successfully!')
+        # Only clear processed requests (approved or rejected), so
+        # pending_request_count is unaffected. At most one chunk is archived
+        # and deleted here; anything left is queued for the
+        # purge_request_history command rather than done in this request.
+        cutoff = timezone.now()
+        deleted, _ = purge_processed_requests(cutoff=cutoff, max_chunks=1)
+        if processed_requests_before(cutoff).exists():
+            HistoryPurge.objects.create(cutoff=cutoff, requested_by=request.user)
+            messages.success(request, f'{deleted} requests archived. The rest of the history is queued and will be cleared by the next scheduler run.')
+        else:
+            messages.success(request, f'Request history cleared successfully! ({deleted} archived)')
     return redirect('manage_requests')
+
+# Content-addressed files never change, so they may be cached for a year
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+MUTABLE_CACHE_CONTROL = 'public, max-age=3600'
+
+@require_safe
+def serve_media(request, path):
+    """Serve an uploaded file, offloading the transfer where possible.
+
+    With MEDIA_SENDFILE_HEADER set to 'X-Accel-Redirect' (nginx) or
+    'X-Sendfile' (Apache/lighttpd) the web server sends the file itself.
+    Otherwise FileResponse hands the open file to the WSGI server's
+    file_wrapper, which can use sendfile().
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Invalid path')
+    if not os.path.isfile(full_path):
+        raise Http404('File not found')
+
+    stat = os.stat(full_path)
+    immutable = is_content_addressed(path)
+    if immutable:
+        etag = '"%s"' % os.path.splitext(os.path.basename(path))[0]
+    else:
+        etag = '"%x-%x"' % (int(stat.st_mtime), stat.st_size)
+    cache_control = IMMUTABLE_CACHE_CONTROL if immutable else MUTABLE_CACHE_CONTROL
+
+    # If-None-Match / If-Modified-Since (and If-Match for 412) per RFC 9110
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is not None:
+        if response.status_code == 304:
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(stat.st_mtime)
+            response['Cache-Control'] = cache_control
+        return response
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    sendfile_header = getattr(settings, 'MEDIA_SENDFILE_HEADER', None)
+    if sendfile_header == 'X-Accel-Redirect':
+        response = HttpResponse(content_type=content_type or 'application/octet-stream')
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + path.lstrip('/')
+    elif sendfile_header == 'X-Sendfile':
+        response = HttpResponse(content_type=content_type or 'application/octet-stream')
+        response['X-Sendfile'] = full_path
+    else:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+        response['Content-Length'] = stat.st_size
+        if encoding:
+            response['Content-Encoding'] = encoding
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = cache_control
+    return response